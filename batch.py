@@ -0,0 +1,159 @@
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import cache
+from pathlib import Path
+
+import machine
+from isa import Program, read_code
+from lockstep import LockstepEngine
+from ports import InputPort
+
+# Движок пакета, исполняющий задания с общим кодом синхронно в одном процессе (`lockstep.py`)
+LOCKSTEP = "lockstep"
+
+REPORT_FIELDS = ["code", "input", "output", "instr_counter", "ticks", "wall_time", "error"]
+
+
+@cache
+def load_code(code_file: str) -> tuple[Program, dict]:
+    """Машинный код загружается один раз на процесс-исполнитель"""
+    return read_code(code_file)
+
+
+def run_job(job: tuple[str, str | None], engine: str = "fast") -> dict:
+    """Одна модель: код + ввод. Ошибка модели попадает в отчёт, а не прерывает пакет"""
+    code_file, input_file = job
+    result = dict.fromkeys(REPORT_FIELDS)
+    result.update({"code": code_file, "input": input_file})
+    start = time.perf_counter()
+    try:
+        code, memory = load_code(code_file)
+        if input_file is None:
+            output, instructions, ticks = machine.simulation(code, InputPort(), memory, engine)
+        else:
+            with open(input_file, encoding="utf-8") as f:
+                output, instructions, ticks = machine.simulation(code, InputPort(f), memory, engine)
+        result.update({"output": output, "instr_counter": instructions, "ticks": ticks})
+    except Exception as e:
+        result["error"] = f"{type(e).__name__}: {e}"
+    result["wall_time"] = time.perf_counter() - start
+    return result
+
+
+def run_lockstep(code_file: str, input_files: list[str | None]) -> list[dict]:
+    """Все вводы одной программы исполняются `LockstepEngine`, ошибка модели - общая для группы"""
+    results = []
+    start = time.perf_counter()
+    try:
+        code, memory = load_code(code_file)
+        inputs = []
+        for input_file in input_files:
+            if input_file is None:
+                inputs.append("")
+            else:
+                with open(input_file, encoding="utf-8") as f:
+                    inputs.append(f.read())
+        outcomes = LockstepEngine(code, memory, inputs).run(machine.TICK_LIMIT)
+    except Exception as e:
+        outcomes = [{"error": f"{type(e).__name__}: {e}"}] * len(input_files)
+    wall_time = (time.perf_counter() - start) / max(1, len(input_files))
+    for input_file, outcome in zip(input_files, outcomes):
+        result = dict.fromkeys(REPORT_FIELDS)
+        result.update({"code": code_file, "input": input_file, "wall_time": wall_time})
+        if isinstance(outcome, dict):
+            result.update(outcome)
+        else:
+            result.update(zip(("output", "instr_counter", "ticks"), outcome))
+        results.append(result)
+    return results
+
+
+def run_batch(jobs: list[tuple[str, str | None]], engine: str = "fast", workers: int | None = None) -> list[dict]:
+    """Исполняет пакет на пуле процессов, результаты - в порядке заданий.
+
+    Для `lockstep` задания группируются по коду, и группы распределяются по процессам.
+    """
+    if engine == LOCKSTEP:
+        groups = {}
+        for position, (code_file, input_file) in enumerate(jobs):
+            groups.setdefault(code_file, []).append((position, input_file))
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            grouped = executor.map(
+                run_lockstep, groups, [[input_file for _, input_file in group] for group in groups.values()]
+            )
+            results = [None] * len(jobs)
+            for group, group_results in zip(groups.values(), grouped):
+                for (position, _), result in zip(group, group_results):
+                    results[position] = result
+        return results
+    workers = workers or os.cpu_count() or 1
+    chunksize = max(1, len(jobs) // (4 * workers))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(run_job, jobs, [engine] * len(jobs), chunksize=chunksize))
+
+
+def read_manifest(manifest: str) -> list[tuple[str, str | None]]:
+    """Манифест - JSON список `{"code": ..., "input": ...}`, пути относительно манифеста"""
+    base = Path(manifest).parent
+    with open(manifest, encoding="utf-8") as f:
+        entries = json.load(f)
+    return [
+        (
+            str(base / entry["code"]),
+            str(base / entry["input"]) if entry.get("input") is not None else None,
+        )
+        for entry in entries
+    ]
+
+
+def directory_jobs(code_dir: str, input_dir: str | None = None) -> list[tuple[str, str | None]]:
+    """Задания по каталогам: `<code_dir>/<name>.*` исполняется с `<input_dir>/<name>.txt`, если он есть"""
+    jobs = []
+    for code_file in sorted(Path(code_dir).iterdir()):
+        input_file = None
+        if input_dir is not None:
+            candidate = Path(input_dir) / (code_file.stem + ".txt")
+            input_file = str(candidate) if candidate.exists() else None
+        jobs.append((str(code_file), input_file))
+    return jobs
+
+
+def write_report(results: list[dict], report: str):
+    """Отчёт в CSV (по расширению `.csv`) или JSON"""
+    with open(report, "w", encoding="utf-8", newline="") as f:
+        if report.endswith(".csv"):
+            writer = csv.DictWriter(f, fieldnames=REPORT_FIELDS)
+            writer.writeheader()
+            writer.writerows(results)
+        else:
+            json.dump(results, f, indent=1, ensure_ascii=False)
+
+
+def main(jobs: list[tuple[str, str | None]], report: str, engine: str = "fast", workers: int | None = None):
+    start = time.perf_counter()
+    results = run_batch(jobs, engine, workers)
+    write_report(results, report)
+    failed = sum(result["error"] is not None for result in results)
+    print(f"jobs: {len(results)} failed: {failed} wall_time: {time.perf_counter() - start:.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        usage="python3 batch.py (--manifest <file> | --code-dir <dir> [--input-dir <dir>]) --report <file.json|file.csv>"
+    )
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--manifest", help='JSON list of {"code": <file>, "input": <file or null>}')
+    source.add_argument("--code-dir", help="directory of machine code files")
+    parser.add_argument("--input-dir", help="directory of <name>.txt inputs for --code-dir")
+    parser.add_argument("--report", required=True, help="report file, CSV if it ends with .csv, otherwise JSON")
+    parser.add_argument("--engine", choices=[*machine.ENGINES, LOCKSTEP], default="fast")
+    parser.add_argument("--workers", type=int, help="worker processes (default - number of CPUs)")
+    args = parser.parse_args()
+    jobs = read_manifest(args.manifest) if args.manifest else directory_jobs(args.code_dir, args.input_dir)
+    main(jobs, args.report, args.engine, args.workers)
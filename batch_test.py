@@ -0,0 +1,60 @@
+import json
+import os
+import tempfile
+from pathlib import Path
+
+import batch
+import machine
+import pytest
+from engine_test import input_tokens
+from isa import read_code
+
+
+def test_batch_matches_single_runs():
+    jobs = batch.directory_jobs("machine", "input")
+    results = batch.run_batch(jobs, workers=2)
+
+    assert [(result["code"], result["input"]) for result in results] == jobs
+    for (code_file, input_file), result in zip(jobs, results):
+        if code_file.endswith("test.json"):
+            assert result["error"] is not None
+            continue
+        code, memory = read_code(code_file)
+        output, instructions, ticks = machine.simulation(code, input_tokens(input_file), memory)
+        assert result["error"] is None
+        assert (result["output"], result["instr_counter"], result["ticks"]) == (output, instructions, ticks)
+
+
+def test_manifest_and_report():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        manifest = os.path.join(tmpdirname, "manifest.json")
+        with open(manifest, "w", encoding="utf-8") as f:
+            json.dump(
+                [{"code": str(Path("machine/cat.json").resolve()), "input": str(Path("input/cat.txt").resolve())}], f
+            )
+        json_report = os.path.join(tmpdirname, "report.json")
+        csv_report = os.path.join(tmpdirname, "report.csv")
+
+        batch.main(batch.read_manifest(manifest), json_report, workers=1)
+        batch.main(batch.read_manifest(manifest), csv_report, workers=1)
+
+        with open(json_report, encoding="utf-8") as f:
+            report = json.load(f)
+        with open(csv_report, encoding="utf-8") as f:
+            header = f.readline().strip()
+
+    assert report[0]["output"] == "Cat, dog - bird : nothing"
+    assert header == ",".join(batch.REPORT_FIELDS)
+
+
+def test_lockstep_batch_matches_fast():
+    pytest.importorskip("numpy")
+    jobs = [("machine/cat.json", "input/cat.txt"), ("machine/prob2.json", None), ("machine/cat.json", None)]
+
+    results = batch.run_batch(jobs, batch.LOCKSTEP, workers=1)
+
+    expected = batch.run_batch(jobs, workers=1)
+    for result, reference in zip(results, expected):
+        assert result["error"] is None
+        assert result["output"] == reference["output"]
+        assert (result["instr_counter"], result["ticks"]) == (reference["instr_counter"], reference["ticks"])
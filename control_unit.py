@@ -1,12 +1,19 @@
 from __future__ import annotations
 
+from array import array
+from functools import partial
+
 from datapath import DataPath
-from isa import Instruction
-from mc import ALU, IO, MEMORY, MUX, Halt, Latch, opcode_to_mpc
+from isa import Opcode, Program
+from mc import ALU, IO, MEMORY, MUX, Halt, Latch, decode_program, mc_memory, microcode_ticks
 
 
 class ControlUnit:
-    microprogram_memory: list = None
+    microprogram_memory: Program = None
+    instructions: int = None
+    entries: array = None
+    args: array = None
+    microcode: list[tuple] = None
     mpc: int = None
     instruction_decoder: int = None
 
@@ -15,19 +22,23 @@ class ControlUnit:
     datapath: DataPath = None
 
     _tick: int = None
-    _ir: Instruction = None
+    _ir: int = None
 
     mux_mpc: MUX = None
     mux_pc: MUX = None
     mux_jmp_type: MUX = None
 
-    def __init__(self, microprogram: list, datapath: DataPath):
+    def __init__(self, microprogram: Program, datapath: DataPath, microcode: list = mc_memory):
         self.datapath = datapath
         self.microprogram_memory = microprogram
+        self.entries = decode_program(microprogram)
+        self.args = microprogram.args
+        self.microcode = self.compile_microcode(microcode)
         self._tick = 0
         self.mpc = 0
         self.ports = []
         self.instruction_decoder = 0
+        self.instructions = 0
 
     def tick(self):
         self._tick += 1
@@ -42,6 +53,10 @@ class ControlUnit:
             if not self.datapath.get_zero():
                 return MUX.PC_ADDR
             return MUX.PC_INC
+        if self.mux_jmp_type == MUX.JMP_TYPE_LOOP:
+            if self.datapath.get_loop():
+                return MUX.PC_ADDR
+            return MUX.PC_INC
         if self.mux_jmp_type == MUX.JMP_TYPE_MPC:
             return self.mux_pc
         raise ValueError("Unknown mux_jmp_type signal: " + self.mux_jmp_type)
@@ -50,7 +65,7 @@ class ControlUnit:
         if self.mux_mpc == MUX.MPC_INC:
             return self.mpc + 1
         if self.mux_mpc == MUX.MPC_OPCODE:
-            return opcode_to_mpc(self._ir.opcode)
+            return self.entries[self._ir]
         if self.mux_mpc == MUX.MPC_ZERO:
             return 0
         raise ValueError("Unknown mux_mpc signal: " + self.mux_mpc)
@@ -58,11 +73,11 @@ class ControlUnit:
     def signal_mux_pc(self):
         self.mux_pc = self.signal_mux_jmp_type()
         if self.mux_pc == MUX.PC_INC:
-            if self.mux_jmp_type == MUX.JMP_TYPE_ZERO:
+            if self.mux_jmp_type in (MUX.JMP_TYPE_ZERO, MUX.JMP_TYPE_LOOP):
                 return self.datapath._pc
             return self.datapath._pc + 1
         if self.mux_pc == MUX.PC_ADDR:
-            return self.microprogram_memory[self.datapath._pc].arg.value
+            return self.args[self.datapath._pc]
         if self.mux_pc == MUX.PC_RET:
             return self.datapath.return_stack[self.datapath.return_stack_pointer]
         raise ValueError("Unknown mux_pc signal: " + self.mux_pc)
@@ -87,73 +102,204 @@ class ControlUnit:
         self.mpc = self.signal_mux_mpc()
 
     def signal_latch_ir(self):
-        self._ir = self.microprogram_memory[self.datapath._pc]
+        self._ir = self.datapath._pc
+
+    # Microcode
+
+    def signal_handlers(self) -> dict:
+        """Сопоставляет каждому сигналу микрокоманды обработчик без аргументов"""
+        selectors = {
+            self.select_signal_mpc: [MUX.MPC_INC, MUX.MPC_OPCODE, MUX.MPC_ZERO],
+            self.datapath.select_signal_tos: [
+                MUX.TOS_ALU,
+                MUX.TOS_RETURN_STACK,
+                MUX.TOS_IN,
+                MUX.TOS_MEMORY,
+                MUX.TOS_NEXT,
+                MUX.TOS_STACK,
+            ],
+            self.datapath.select_signal_return_stack: [MUX.RS_PC, MUX.RS_TOS, MUX.RS_INC],
+            self.datapath.select_signal_return_stack_pointer: [MUX.RSP_DEC, MUX.RSP_INC, MUX.RSP_LOOP],
+            self.select_signal_pc: [MUX.PC_ADDR, MUX.PC_INC, MUX.PC_RET],
+            self.datapath.select_signal_stack_pointer: [MUX.SP_DEC, MUX.SP_INC, MUX.SP_DOUBLE_DEC],
+            self.select_signal_jmp_type: [MUX.JMP_TYPE_MPC, MUX.JMP_TYPE_ZERO, MUX.JMP_TYPE_LOOP],
+            self.datapath.select_signal_alu_operation: list(ALU),
+        }
+        handlers = {signal: partial(select, signal) for select, signals in selectors.items() for signal in signals}
+        handlers.update(
+            {
+                MUX.TOS_IMM: self.select_signal_immediate,
+                Latch.PC: self.signal_latch_pc,
+                Latch.MPC: self.signal_latch_mpc,
+                Latch.IR: self.signal_latch_ir,
+                Latch.TOP: self.datapath.signal_latch_top,
+                Latch.NEXT: self.datapath.signal_latch_next,
+                Latch.RSP: self.datapath.signal_latch_return_stack_pointer,
+                Latch.RS: self.datapath.signal_latch_return_stack,
+                Latch.SP: self.datapath.signal_latch_stack_pointer,
+                IO.IN: self.signal_input,
+                IO.OUT: self.signal_output,
+                MEMORY.RD: self.signal_memory_read,
+                MEMORY.WR: self.signal_memory_write,
+            }
+        )
+        handlers.update(self.datapath.signal_handlers())
+        return handlers
+
+    def compile_microcode(self, microcode: list) -> list[tuple]:
+        """Однократно переводит микропрограмму в кортежи обработчиков сигналов"""
+        handlers = self.signal_handlers()
+        compiled = []
+        for micro_instruction in microcode:
+            signals = []
+            for signal in micro_instruction:
+                if isinstance(signal, Halt):
+                    signals.append(self.signal_halt)
+                elif signal in handlers:
+                    signals.append(handlers[signal])
+            compiled.append(tuple(signals))
+        return compiled
+
+    def select_signal_immediate(self):
+        self.datapath.immediate_value = self.args[self.datapath._pc]
+        self.datapath.select_signal_tos(MUX.TOS_IMM)
+
+    def signal_halt(self):
+        raise StopIteration("Halt!")
+
+    def signal_input(self):
+        self.datapath.signal_input(self.datapath.stack[self.datapath.stack_pointer])
+
+    def signal_output(self):
+        self.datapath.signal_output(
+            self.datapath.return_stack[self.datapath.return_stack_pointer],
+            self.datapath.stack[self.datapath.stack_pointer],
+        )
+
+    def signal_memory_read(self):
+        self.datapath.signal_memory_read(self.datapath.stack[self.datapath.stack_pointer])
+
+    def signal_memory_write(self):
+        self.datapath.signal_memory_write(
+            self.datapath.stack[self.datapath.stack_pointer - 1],
+            self.datapath.stack[self.datapath.stack_pointer],
+        )
+
+    def run(self, tick_limit: int, until: Opcode | None = None) -> bool:
+        """Исполняет микрокоманды до HALT или до исчерпания тактов.
 
-    def dispatch_micro_instruction(self, microcode: list):  # noqa: C901
+        С `until` останавливается перед выборкой первой инструкции с этим опкодом
+        (True - остановка произошла, модель на границе инструкций).
+        """
+        trace = self.datapath.trace
+        opcodes = self.microprogram_memory.opcodes
+        try:
+            while self._tick < tick_limit:
+                if self.mpc == 0:
+                    if until is not None and opcodes[self.datapath._pc + 1] is until:
+                        return True
+                    self.instructions += 1
+                self.dispatch_micro_instruction()
+                if trace is not None:
+                    trace.tick(self)
+        except StopIteration:
+            pass
+        return False
+
+    def snapshot(self) -> dict:
+        """Регистры устройства управления (см. `DataPath.snapshot`)"""
+        return {name: getattr(self, name) for name in ("mpc", "_tick", "_ir", "instructions", "instruction_decoder")}
+
+    def restore(self, state: dict):
+        for name, value in state.items():
+            setattr(self, name, value)
+
+    def dispatch_micro_instruction(self):
         self.mux_jmp_type = MUX.JMP_TYPE_MPC
 
-        for signal in microcode:
-            if signal in [MUX.MPC_INC, MUX.MPC_OPCODE, MUX.MPC_ZERO]:
-                self.select_signal_mpc(signal)
-            elif signal in [MUX.TOS_ALU, MUX.TOS_RETURN_STACK, MUX.TOS_IN, MUX.TOS_MEMORY, MUX.TOS_IMM]:
-                if signal is MUX.TOS_IMM:
-                    self.datapath.immediate_value = self.microprogram_memory[self.datapath._pc].arg.value
-                self.datapath.select_signal_tos(signal)
-            elif signal in [MUX.RS_PC, MUX.RS_TOS]:
-                self.datapath.select_signal_return_stack(signal)
-            elif signal in [MUX.RSP_DEC, MUX.RSP_INC]:
-                self.datapath.select_signal_return_stack_pointer(signal)
-            elif signal in [MUX.PC_ADDR, MUX.PC_INC, MUX.PC_RET]:
-                self.select_signal_pc(signal)
-            elif signal in [MUX.SP_DEC, MUX.SP_INC, MUX.SP_DOUBLE_DEC]:
-                self.datapath.select_signal_stack_pointer(signal)
-            elif signal in [MUX.JMP_TYPE_MPC, MUX.JMP_TYPE_ZERO]:
-                self.select_signal_jmp_type(signal)
-            elif signal in [ALU.DIV, ALU.EQ, ALU.GR, ALU.LS, ALU.SUB, ALU.ADD, ALU.MUL, ALU.MOD]:
-                self.datapath.select_signal_alu_operation(signal)
-            elif isinstance(signal, Halt):
-                raise StopIteration("Halt!")
-            else:
-                match signal:
-                    case Latch.PC:
-                        self.signal_latch_pc()
-                    case Latch.MPC:
-                        self.signal_latch_mpc()
-                    case Latch.IR:
-                        self.signal_latch_ir()
-                    case Latch.TOP:
-                        self.datapath.signal_latch_top()
-                    case Latch.NEXT:
-                        self.datapath.signal_latch_next()
-                    case Latch.RSP:
-                        self.datapath.signal_latch_return_stack_pointer()
-                    case Latch.RS:
-                        self.datapath.signal_latch_return_stack()
-                    case Latch.SP:
-                        self.datapath.signal_latch_stack_pointer()
-                    case IO.IN:
-                        self.datapath.signal_input(self.datapath.stack[self.datapath.stack_pointer])
-                    case IO.OUT:
-                        self.datapath.signal_output(
-                            self.datapath.return_stack[self.datapath.return_stack_pointer],
-                            self.datapath.stack[self.datapath.stack_pointer],
-                        )
-                    case MEMORY.RD:
-                        self.datapath.signal_memory_read(self.datapath.stack[self.datapath.stack_pointer])
-                    case MEMORY.WR:
-                        self.datapath.signal_memory_write(
-                            self.datapath.stack[self.datapath.stack_pointer - 1],
-                            self.datapath.stack[self.datapath.stack_pointer],
-                        )
-                    case _:
-                        pass
-        self.tick()
+        for signal in self.microcode[self.mpc]:
+            signal()
+        self._tick += 1
+
+    def state(self) -> tuple:
+        """Снимок регистров для трассировки: PC, опкод в IR, TICK, MPC, TOP, NEXT, RS, SP, RSP"""
+        datapath = self.datapath
+        return (
+            datapath._pc,
+            self.microprogram_memory.opcodes[self._ir] if self._ir is not None else None,
+            self._tick,
+            self.mpc,
+            datapath.stack[datapath.stack_pointer],
+            datapath.stack[datapath.stack_pointer - 1],
+            datapath.return_stack[datapath.return_stack_pointer],
+            datapath.stack_pointer,
+            datapath.return_stack_pointer,
+        )
 
     def __repr__(self):
+        ir = self.microprogram_memory.instruction(self._ir) if self._ir is not None else None
         return (
-            f"[{self.datapath._pc}: {self._ir.opcode if self._ir is not None else 'NO_OPCODE' }] TICK: {self.current_tick()} MPC: {self.mpc} "
-            f"IR: {self._ir} TOP: {self.datapath.stack[self.datapath.stack_pointer]} "
-            f"NEXT: {self.datapath.stack[self.datapath.stack_pointer-1]} "
+            f"[{self.datapath._pc}: {ir.opcode if ir is not None else 'NO_OPCODE'}] TICK: {self.current_tick()} MPC: {self.mpc} "
+            f"IR: {ir} TOP: {self.datapath.stack[self.datapath.stack_pointer]} "
+            f"NEXT: {self.datapath.stack[self.datapath.stack_pointer - 1]} "
             f"RS: {self.datapath.return_stack[self.datapath.return_stack_pointer]} SP: {self.datapath.stack_pointer} "
             f"RSP: {self.datapath.return_stack_pointer}"
         )
+
+
+class PipelinedControlUnit(ControlUnit):
+    """Двухстадийный конвейер: выборка инструкции N+1 идёт параллельно с исполнением N.
+
+    Исполнение - те же шаги микропрограммы и сигналы DataPath, что и у `ControlUnit`,
+    а выборка (шаги 0..2 микропрограммы) вынесена в отдельную стадию:
+
+    - инструкция занимает max(шаги исполнения, такты выборки); если исполнение короче выборки,
+      стадия исполнения простаивает (`stalls` - число тактов простоя);
+    - HALT завершает работу сразу, без ожидания выборки;
+    - если инструкция изменила PC (выполненный JMP/ZJMP/CALL/RET/LOOP), выбранная заранее
+      инструкция сбрасывается и конвейер заполняется заново (`flushes`).
+    """
+
+    fetch_ticks: int = None
+    execute_ticks: list[int] = None
+    instructions: int = None
+    stalls: int = None
+    flushes: int = None
+
+    def __init__(self, microprogram: Program, datapath: DataPath, microcode: list = mc_memory):
+        super().__init__(microprogram, datapath, microcode)
+        self.fetch_ticks = microcode_ticks(microcode, 0)
+        steps = {entry: microcode_ticks(microcode, entry) for entry in set(self.entries)}
+        self.execute_ticks = [steps[entry] for entry in self.entries]
+        self.instructions = 0
+        self.stalls = 0
+        self.flushes = 0
+
+    def fetch(self):
+        self.datapath._pc += 1
+        self._ir = self.datapath._pc
+        self.mpc = self.entries[self._ir]
+
+    def run(self, tick_limit: int):
+        """Исполняет программу до HALT или до исчерпания тактов (первое заполнение конвейера - выборка)"""
+        self._tick = min(self.fetch_ticks, tick_limit)
+        self.fetch()
+        try:
+            while self._tick < tick_limit:
+                pc = self.datapath._pc
+                self.instructions += 1
+                stall = max(0, self.fetch_ticks - self.execute_ticks[pc]) if self.execute_ticks[pc] else 0
+                if self._tick + stall + self.execute_ticks[pc] > tick_limit:
+                    self._tick = tick_limit
+                    break
+                self._tick += stall
+                self.stalls += stall
+                self.dispatch_micro_instruction()
+                while self.mpc != 0:
+                    self.dispatch_micro_instruction()
+                if self.datapath._pc != pc:
+                    self.flushes += 1
+                    self._tick = min(self._tick + self.fetch_ticks, tick_limit)
+                self.fetch()
+        except StopIteration:
+            pass
@@ -1,9 +1,46 @@
 from __future__ import annotations
 
-import logging
+import operator
+from array import array
 
 from isa import MEMORY_SIZE, STACK_SIZE
-from mc import ALU, MUX
+from mc import ALU, MUX, Latch
+from memory import PagedMemory, make_memory
+from ports import INPUT_PORT, OUTPUT_PORT, InputPort, OutputPort
+from tracer import TraceSink
+
+WORD_BITS = 32
+
+# Операции АЛУ над числами Python (DIV даёт float)
+ALU_OPERATIONS = {
+    ALU.ADD: operator.add,
+    ALU.SUB: operator.sub,
+    ALU.MUL: operator.mul,
+    ALU.DIV: operator.truediv,
+    ALU.MOD: operator.mod,
+    ALU.EQ: lambda left, right: -1 if left == right else 0,
+    ALU.GR: lambda left, right: -1 if left > right else 0,
+    ALU.LS: lambda left, right: -1 if left < right else 0,
+}
+
+
+def to_word(value: int) -> int:
+    """Значение машинного слова: дополнительный код с переполнением по модулю 2**32
+
+    >>> to_word(2**31), to_word(-1), to_word(3000000000)
+    (-2147483648, -1, -1294967296)
+    """
+    return (value + (1 << (WORD_BITS - 1))) % (1 << WORD_BITS) - (1 << (WORD_BITS - 1))
+
+
+# Операции АЛУ над 32-битными словами: переполнение по модулю, DIV - деление с округлением вниз
+WORD_ALU_OPERATIONS = {
+    **ALU_OPERATIONS,
+    ALU.ADD: lambda left, right: to_word(left + right),
+    ALU.SUB: lambda left, right: to_word(left - right),
+    ALU.MUL: lambda left, right: to_word(left * right),
+    ALU.DIV: lambda left, right: to_word(left // right),
+}
 
 
 class DataPath:
@@ -16,38 +53,64 @@ class DataPath:
     return_stack_pointer: int = None
     immediate_value: int = None
     memory_value: int = None
-    _io: dict[int] = None
+    _io: dict[int, InputPort | OutputPort] = None
     _pc: int = None
     _bf: int = None
 
-    memory: list = None
+    memory: list | array | PagedMemory = None
     memory_size: int = None
 
     alu_operation: ALU = None
+    alu_operations: dict = ALU_OPERATIONS
 
     mux_tos: MUX = None
     mux_ret_stack: MUX = None
     mux_rsp: MUX = None
     mux_sp: MUX = None
 
-    def __init__(self, input_buffer: list[str]):
+    trace: TraceSink | None = None
+
+    def __init__(
+        self,
+        input_buffer: InputPort | list[str],
+        output_port: OutputPort | None = None,
+        memory_size: int = MEMORY_SIZE,
+        memory_file: str | None = None,
+    ):
         self.stack_size = STACK_SIZE
         self.return_stack_size = STACK_SIZE
         self.stack = [0] * STACK_SIZE
         self.return_stack = [0] * STACK_SIZE
         self.stack_pointer = -1
         self.return_stack_pointer = -1
-        self.memory_size = MEMORY_SIZE
-        self.memory = [0] * self.memory_size
+        self.memory_size = memory_size
+        self.memory = self.make_memory(memory_file)
         self._bf = 0
         self._io = {}
         self._pc = -1
-        self._io[10] = input_buffer
-        self._io[11] = []
+        self._io[INPUT_PORT] = input_buffer if isinstance(input_buffer, InputPort) else InputPort(input_buffer)
+        self._io[OUTPUT_PORT] = output_port if output_port is not None else OutputPort()
+
+    def signal_handlers(self) -> dict:
+        """Обработчики сигналов, которые есть только в этой конфигурации тракта"""
+        return {}
+
+    def make_memory(self, memory_file: str | None):
+        """Память данных: плоский список, страницы (больше `memory.PAGE_SIZE`) или mmap файла"""
+        return make_memory(self.memory_size, path=memory_file)
+
+    def close(self):
+        """Освобождает память данных, отображённую в файл"""
+        if isinstance(self.memory, PagedMemory):
+            self.memory.close()
+
+    def word(self, value: int) -> int:
+        """Значение, которое тракт может сохранить в ячейке стека или памяти"""
+        return value
 
     def fill_memory(self, memory: dict):
         for key in memory.keys():
-            self.memory[int(key)] = memory[key]
+            self.memory[int(key)] = self.word(memory[key])
 
     # MUX value
 
@@ -64,37 +127,12 @@ class DataPath:
             return self.immediate_value
         raise ValueError("Unknown mux_tos signal: " + self.mux_tos)
 
-    def get_alu_operation(self):  # noqa: C901
+    def get_alu_operation(self):
         left = self.stack[self.stack_pointer - 1]
         right = self.stack[self.stack_pointer]
-        result = 0
-        if self.alu_operation == ALU.DIV:
-            result = left / right
-        elif self.alu_operation == ALU.SUB:
-            result = left - right
-        elif self.alu_operation == ALU.ADD:
-            result = left + right
-        elif self.alu_operation == ALU.MUL:
-            result = left * right
-        elif self.alu_operation == ALU.EQ:
-            if left == right:
-                result = -1
-            else:
-                result = 0
-        elif self.alu_operation == ALU.LS:
-            if left < right:
-                result = -1
-            else:
-                result = 0
-        elif self.alu_operation == ALU.GR:
-            if left > right:
-                result = -1
-            else:
-                result = 0
-        elif self.alu_operation == ALU.MOD:
-            result = left % right
-        else:
+        if self.alu_operation not in self.alu_operations:
             raise ValueError("Unknown alu_operation signal: " + self.alu_operation)
+        result = self.alu_operations[self.alu_operation](left, right)
         self._Z = result == 0
 
         return result
@@ -113,6 +151,8 @@ class DataPath:
             return self.return_stack_pointer + 1
         if self.mux_rsp == MUX.RSP_DEC:
             return self.return_stack_pointer - 1
+        if self.mux_rsp == MUX.RSP_LOOP:
+            return self.return_stack_pointer + 1 if self.get_loop() else self.return_stack_pointer - 1
         raise ValueError("Unknown mux_return_stack_pointer signal: " + self.mux_rsp)
 
     def signal_mux_return_stack(self):
@@ -120,6 +160,8 @@ class DataPath:
             return self._pc
         if self.mux_ret_stack == MUX.RS_TOS:
             return self.stack[self.stack_pointer]
+        if self.mux_ret_stack == MUX.RS_INC:
+            return self.return_stack[self.return_stack_pointer] + 1
         raise ValueError("Unknown mux_return_stack signal: " + self.mux_ret_stack)
 
     # MUX
@@ -162,20 +204,15 @@ class DataPath:
     #
 
     def signal_input(self, port: int):
-        input_buffer = self._io[port]
-        in_value = input_buffer[0]
+        in_value = self._io[port].read()
         self.input_value = in_value
-        if ord(in_value) == 0:
-            in_value = ""
-        self._io[port] = input_buffer[1:]
-        logging.debug(f"INPUT: '{in_value}'")
+        if self.trace is not None:
+            self.trace.input(port, in_value if ord(in_value) != 0 else "")
 
     def signal_output(self, port: int, value: int):
-        output_buffer = self._io[port] + [value]
-        logging.debug(
-            f"OUTPUT: {''.join(map(lambda x: chr(x) if x > 9 and x < 256 else str(x), self._io[port]))} << '{value}'"
-        )
-        self._io[port] = output_buffer
+        if self.trace is not None:
+            self.trace.output(port, value)
+        self._io[port].write(value)
 
     def signal_memory_read(self, addr: int):
         self.memory_value = self.memory[addr]
@@ -185,3 +222,64 @@ class DataPath:
 
     def get_zero(self):
         return self.stack[self.stack_pointer] == 0
+
+    def get_loop(self):
+        """Цикл продолжается, пока счётчик RS[RSP] меньше границы RS[RSP + 1]"""
+        return self.return_stack[self.return_stack_pointer + 1] > self.return_stack[self.return_stack_pointer]
+
+
+class RegisterDataPath(DataPath):
+    """Тракт с выделенными регистрами TOP/NEXT.
+
+    Кроме пути через стек возврата есть прямой путь NEXT -> TOP (`MUX.TOS_NEXT`),
+    чтение ячейки стека под NEXT (`MUX.TOS_STACK`) и обмен TOP <-> NEXT за один такт
+    (`Latch.TOP_NEXT`). Используется с микропрограммой `mc.register_mc_memory`.
+    """
+
+    def signal_handlers(self) -> dict:
+        return {Latch.TOP_NEXT: self.signal_latch_top_next}
+
+    def signal_mux_tos(self):
+        if self.mux_tos == MUX.TOS_NEXT:
+            return self.stack[self.stack_pointer - 1]
+        if self.mux_tos == MUX.TOS_STACK:
+            return self.stack[self.stack_pointer - 2]
+        return super().signal_mux_tos()
+
+    def signal_latch_top_next(self):
+        sp = self.stack_pointer
+        self.stack[sp], self.stack[sp - 1] = self.stack[sp - 1], self.stack[sp]
+
+
+class CompactDataPath(DataPath):
+    """Тракт с 32-битными ячейками: стеки и память - `array('i')`, а не списки чисел Python.
+
+    Занимает 4 байта на ячейку, результаты АЛУ, непосредственные значения и инкремент
+    счётчика цикла переполняются по модулю 2**32, DIV - целочисленное деление
+    (`WORD_ALU_OPERATIONS`). Микропрограмма та же, что у `DataPath`.
+    """
+
+    alu_operations: dict = WORD_ALU_OPERATIONS
+
+    def __init__(
+        self,
+        input_buffer: InputPort | list[str],
+        output_port: OutputPort | None = None,
+        memory_size: int = MEMORY_SIZE,
+        memory_file: str | None = None,
+    ):
+        super().__init__(input_buffer, output_port, memory_size, memory_file)
+        self.stack = array("i", bytes(4 * self.stack_size))
+        self.return_stack = array("i", bytes(4 * self.return_stack_size))
+
+    def make_memory(self, memory_file: str | None):
+        return make_memory(self.memory_size, "i", memory_file)
+
+    def word(self, value: int) -> int:
+        return to_word(value)
+
+    def signal_mux_tos(self):
+        return to_word(super().signal_mux_tos())
+
+    def signal_mux_return_stack(self):
+        return to_word(super().signal_mux_return_stack())
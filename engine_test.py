@@ -0,0 +1,163 @@
+import contextlib
+import io
+import os
+import tempfile
+
+import machine
+import pytest
+import translator
+from control_unit import PipelinedControlUnit
+from datapath import DataPath
+from isa import MEMORY_SIZE, read_code
+
+PROGRAMS = [
+    ("forth/cat.fth", "input/cat.txt"),
+    ("forth/hello.fth", None),
+    ("forth/hello_user_name.fth", "input/hello_user_name.txt"),
+    ("forth/loop.fth", None),
+    ("forth/prob2.fth", None),
+]
+
+
+def translate(source: str, tmpdirname: str, memory_size: int = MEMORY_SIZE):
+    target = os.path.join(tmpdirname, "target.bin")
+    with contextlib.redirect_stdout(io.StringIO()):
+        translator.main(source, target, data_memory_size=memory_size)
+    return read_code(target)
+
+
+def input_tokens(input_file: str | None) -> list[str]:
+    if input_file is None:
+        return []
+    with open(input_file, encoding="utf-8") as f:
+        return [*list(f.read()), chr(0)]
+
+
+@pytest.mark.parametrize("engine", machine.INSTRUCTION_ENGINES)
+@pytest.mark.parametrize(("source", "input_file"), PROGRAMS)
+def test_engine_matches_microcode(engine, source, input_file):
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        code, memory = translate(source, tmpdirname)
+
+    expected = machine.simulation(code, input_tokens(input_file), memory, "mc")
+    assert machine.simulation(code, input_tokens(input_file), memory, engine) == expected
+
+
+@pytest.mark.parametrize("engine", machine.INSTRUCTION_ENGINES)
+@pytest.mark.parametrize("tick_limit", [50, 51, 52, 53, 1000])
+def test_engine_matches_microcode_on_tick_limit(engine, tick_limit, monkeypatch):
+    monkeypatch.setattr(machine, "TICK_LIMIT", tick_limit)
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        code, memory = translate("forth/prob2.fth", tmpdirname)
+
+    expected = machine.simulation(code, [], memory, "mc")
+    assert machine.simulation(code, [], memory, engine) == expected
+
+
+@pytest.mark.parametrize(("source", "input_file"), PROGRAMS)
+def test_binary_code_matches_json(source, input_file):
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        json_target = os.path.join(tmpdirname, "target.json")
+        binary_target = os.path.join(tmpdirname, "target.bin")
+        with contextlib.redirect_stdout(io.StringIO()):
+            translator.main(source, json_target)
+            translator.main(source, binary_target, "binary")
+        json_code, json_memory = read_code(json_target)
+        binary_code, binary_memory = read_code(binary_target)
+
+    assert binary_code.opcodes == json_code.opcodes
+    assert binary_code.args == json_code.args
+    assert binary_code.has_arg == json_code.has_arg
+    assert machine.simulation(binary_code, input_tokens(input_file), binary_memory) == machine.simulation(
+        json_code, input_tokens(input_file), json_memory
+    )
+
+
+@pytest.mark.parametrize("engine", ["mc", *machine.INSTRUCTION_ENGINES])
+@pytest.mark.parametrize(("source", "input_file"), PROGRAMS)
+def test_register_datapath(engine, source, input_file):
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        code, memory = translate(source, tmpdirname)
+
+    expected_output, expected_instructions, expected_ticks = machine.simulation(code, input_tokens(input_file), memory)
+    output, instructions, ticks = machine.simulation(
+        code, input_tokens(input_file), memory, engine, datapath_kind="register"
+    )
+
+    assert output == expected_output
+    assert instructions == expected_instructions
+    assert ticks < expected_ticks
+    assert machine.simulation(code, input_tokens(input_file), memory, "mc", datapath_kind="register")[2] == ticks
+
+
+@pytest.mark.parametrize(("source", "input_file"), PROGRAMS)
+def test_pipeline_overlaps_fetch(source, input_file):
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        code, memory = translate(source, tmpdirname)
+
+    expected_output, expected_instructions, expected_ticks = machine.simulation(code, input_tokens(input_file), memory)
+    datapath = DataPath(input_tokens(input_file))
+    datapath.fill_memory(memory)
+    control_unit = PipelinedControlUnit(code, datapath)
+    control_unit.run(machine.TICK_LIMIT)
+
+    assert datapath._io[machine.OUTPUT_PORT].text() == expected_output
+    assert control_unit.instructions == expected_instructions
+    assert control_unit.current_tick() < expected_ticks
+    assert control_unit.flushes > 0
+    assert machine.simulation(code, input_tokens(input_file), memory, "pipeline") == (
+        expected_output,
+        expected_instructions,
+        control_unit.current_tick(),
+    )
+
+
+@pytest.mark.parametrize("datapath_kind", machine.DATAPATHS)
+@pytest.mark.parametrize("engine", machine.TIMING_MODELS)
+@pytest.mark.parametrize(("source", "input_file"), PROGRAMS)
+def test_timing_model_matches_microcode_output(engine, datapath_kind, source, input_file):
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        code, memory = translate(source, tmpdirname)
+
+    expected_output, expected_instructions, expected_ticks = machine.simulation(
+        code, input_tokens(input_file), memory, datapath_kind=datapath_kind
+    )
+    output, instructions, ticks = machine.simulation(
+        code, input_tokens(input_file), memory, engine, datapath_kind=datapath_kind
+    )
+
+    assert output == expected_output
+    assert instructions == expected_instructions
+    assert ticks < expected_ticks
+
+
+@pytest.mark.parametrize("engine", machine.ENGINES)
+@pytest.mark.parametrize(("source", "input_file"), PROGRAMS)
+def test_compact_datapath_matches_stack(engine, source, input_file):
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        code, memory = translate(source, tmpdirname)
+
+    expected = machine.simulation(code, input_tokens(input_file), memory, engine)
+    assert machine.simulation(code, input_tokens(input_file), memory, engine, datapath_kind="compact") == expected
+
+
+@pytest.mark.parametrize("engine", machine.ENGINES)
+@pytest.mark.parametrize(
+    ("text", "expected"),
+    [
+        ("2147483647 1 + 11 emit", "-2147483648"),
+        ("65536 65536 * 11 emit", "0"),
+        ("0 2147483647 - 2 - 11 emit", "2147483647"),
+        ("7 2 / 11 emit", "3"),
+        ("0 7 - 2 / 11 emit", "-4"),
+        ("4000000000 11 emit", "-294967296"),
+    ],
+)
+def test_compact_datapath_word_arithmetic(engine, text, expected):
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        source = os.path.join(tmpdirname, "source.fth")
+        with open(source, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        code, memory = translate(source, tmpdirname)
+
+    assert machine.simulation(code, [], memory, engine, datapath_kind="compact")[0] == expected
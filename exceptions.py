@@ -14,3 +14,8 @@ class TokenTranslationError(Exception):
 class BadAllocationSizeError(Exception):
     def __init__(self, pos: int):
         super().__init__("Incorrect allocate size at " + str(pos))
+
+
+class MissingDependencyError(ImportError):
+    def __init__(self, package: str, extra: str):
+        super().__init__(f"{package} is required: poetry install --extras {extra}")
@@ -0,0 +1,243 @@
+from __future__ import annotations
+
+from datapath import DataPath, RegisterDataPath
+from exceptions import UnknownOpcodeError
+from isa import Opcode, Program
+from mc import ALU_OPCODES, MUX
+
+# Такты исполнения инструкции после однотактной выборки
+EXECUTE_STEPS = {
+    **dict.fromkeys(ALU_OPCODES, 1),
+    Opcode.NOP: 1,
+    Opcode.HALT: 0,
+    Opcode.JMP: 1,
+    Opcode.ZJMP: 1,
+    Opcode.CALL: 1,
+    Opcode.RET: 1,
+    Opcode.DROP: 1,
+    Opcode.DUP: 2,
+    Opcode.OVER: 3,
+    Opcode.SWAP: 4,
+    Opcode.POP: 1,
+    Opcode.RPOP: 1,
+    Opcode.PUSH: 1,
+    Opcode.READ: 1,
+    Opcode.EMIT: 2,
+    Opcode.LOAD: 1,
+    Opcode.STORE: 1,
+    Opcode.LOOP: 2,
+    Opcode.INDEX: 1,
+}
+
+# Такты исполнения на тракте с регистрами TOP/NEXT
+REGISTER_EXECUTE_STEPS = {**EXECUTE_STEPS, Opcode.DUP: 1, Opcode.OVER: 1, Opcode.SWAP: 1}
+
+
+class HardwiredControlUnit:
+    """Схемное устройство управления: без памяти микрокоманд и регистра MPC.
+
+    Выборка занимает один такт (PC++ и защёлкивание IR в одном такте, дешифрация опкода -
+    комбинационная схема), затем дешифратор подаёт на DataPath сигналы каждого шага исполнения.
+    Шаги совпадают с микропрограммой, кроме CALL (RSP++ и запись PC в одном такте) и PUSH
+    (SP++ и загрузка TOP в одном такте). На `RegisterDataPath` DUP, OVER и SWAP выполняются за такт.
+    """
+
+    program: Program = None
+    datapath: DataPath = None
+    execute: dict = None
+    steps: list[int] = None
+    instructions: int = None
+
+    _tick: int = None
+    _ir: int = None
+
+    def __init__(self, program: Program, datapath: DataPath, microcode: list | None = None):
+        self.program = program
+        self.datapath = datapath
+        self.instructions = 0
+        self._tick = 0
+        register = isinstance(datapath, RegisterDataPath)
+        table = REGISTER_EXECUTE_STEPS if register else EXECUTE_STEPS
+        self.execute = {opcode: self.decoder(opcode, register) for opcode in set(program.opcodes)}
+        self.steps = [1 + table[opcode] for opcode in program.opcodes]
+
+    def current_tick(self):
+        return self._tick
+
+    def decoder(self, opcode: Opcode, register: bool):
+        if opcode in ALU_OPCODES:
+            return self.execute_alu
+        if register and opcode in (Opcode.DUP, Opcode.OVER, Opcode.SWAP):
+            return getattr(self, f"execute_register_{opcode.value}")
+        handler = getattr(self, f"execute_{opcode.value}", None)
+        if handler is None:
+            raise UnknownOpcodeError(opcode)
+        return handler
+
+    def run(self, tick_limit: int):
+        """Исполняет программу до HALT или до исчерпания тактов (как `Interpreter.run`)"""
+        datapath = self.datapath
+        opcodes = self.program.opcodes
+        try:
+            while self._tick < tick_limit:
+                pc = datapath._pc + 1
+                self.instructions += 1
+                if self._tick + self.steps[pc] > tick_limit:
+                    self._tick = tick_limit
+                    break
+                datapath._pc = pc
+                self._ir = pc
+                self._tick += self.steps[pc]
+                self.execute[opcodes[pc]](opcodes[pc])
+        except StopIteration:
+            pass
+
+    # Сигналы
+
+    def stack_pointer(self, sel: MUX):
+        self.datapath.select_signal_stack_pointer(sel)
+        self.datapath.signal_latch_stack_pointer()
+
+    def return_stack_pointer(self, sel: MUX):
+        self.datapath.select_signal_return_stack_pointer(sel)
+        self.datapath.signal_latch_return_stack_pointer()
+
+    def return_stack(self, sel: MUX):
+        self.datapath.select_signal_return_stack(sel)
+        self.datapath.signal_latch_return_stack()
+
+    def top(self, sel: MUX):
+        self.datapath.select_signal_tos(sel)
+        self.datapath.signal_latch_top()
+
+    def argument(self) -> int:
+        return self.program.args[self._ir]
+
+    # Инструкции
+
+    def execute_alu(self, opcode: Opcode):
+        self.datapath.select_signal_alu_operation(ALU_OPCODES[opcode])
+        self.datapath.select_signal_tos(MUX.TOS_ALU)
+        self.datapath.signal_latch_next()
+        self.stack_pointer(MUX.SP_DEC)
+
+    def execute_nop(self, opcode: Opcode):
+        pass
+
+    def execute_halt(self, opcode: Opcode):
+        raise StopIteration("Halt!")
+
+    def execute_jmp(self, opcode: Opcode):
+        self.datapath._pc = self.argument()
+
+    def execute_zjmp(self, opcode: Opcode):
+        if not self.datapath.get_zero():
+            self.datapath._pc = self.argument()
+        self.stack_pointer(MUX.SP_DEC)
+
+    def execute_call(self, opcode: Opcode):
+        self.return_stack_pointer(MUX.RSP_INC)
+        self.return_stack(MUX.RS_PC)
+        self.datapath._pc = self.argument()
+
+    def execute_ret(self, opcode: Opcode):
+        self.datapath._pc = self.datapath.return_stack[self.datapath.return_stack_pointer]
+        self.return_stack_pointer(MUX.RSP_DEC)
+
+    def execute_drop(self, opcode: Opcode):
+        self.stack_pointer(MUX.SP_DEC)
+
+    def execute_dup(self, opcode: Opcode):
+        self.datapath.select_signal_return_stack(MUX.RS_TOS)
+        self.return_stack_pointer(MUX.RSP_INC)
+        self.datapath.signal_latch_return_stack()
+        self.stack_pointer(MUX.SP_INC)
+        self.top(MUX.TOS_RETURN_STACK)
+        self.return_stack_pointer(MUX.RSP_DEC)
+
+    def execute_over(self, opcode: Opcode):
+        self.stack_pointer(MUX.SP_DEC)
+        self.datapath.select_signal_return_stack(MUX.RS_TOS)
+        self.return_stack_pointer(MUX.RSP_INC)
+        self.datapath.signal_latch_return_stack()
+        self.stack_pointer(MUX.SP_INC)
+        self.stack_pointer(MUX.SP_INC)
+        self.top(MUX.TOS_RETURN_STACK)
+        self.return_stack_pointer(MUX.RSP_DEC)
+
+    def execute_swap(self, opcode: Opcode):
+        self.return_stack_pointer(MUX.RSP_INC)
+        self.return_stack(MUX.RS_TOS)
+        self.stack_pointer(MUX.SP_DEC)
+        self.datapath.select_signal_return_stack(MUX.RS_TOS)
+        self.return_stack_pointer(MUX.RSP_INC)
+        self.datapath.signal_latch_return_stack()
+        self.stack_pointer(MUX.SP_INC)
+        self.top(MUX.TOS_RETURN_STACK)
+        self.return_stack_pointer(MUX.RSP_DEC)
+        self.datapath.select_signal_tos(MUX.TOS_RETURN_STACK)
+        self.datapath.signal_latch_next()
+        self.return_stack_pointer(MUX.RSP_DEC)
+
+    def execute_register_dup(self, opcode: Opcode):
+        self.stack_pointer(MUX.SP_INC)
+        self.top(MUX.TOS_NEXT)
+
+    def execute_register_over(self, opcode: Opcode):
+        self.stack_pointer(MUX.SP_INC)
+        self.top(MUX.TOS_STACK)
+
+    def execute_register_swap(self, opcode: Opcode):
+        self.datapath.signal_latch_top_next()
+
+    def execute_pop(self, opcode: Opcode):
+        self.datapath.select_signal_return_stack(MUX.RS_TOS)
+        self.return_stack_pointer(MUX.RSP_INC)
+        self.datapath.signal_latch_return_stack()
+        self.stack_pointer(MUX.SP_DEC)
+
+    def execute_rpop(self, opcode: Opcode):
+        self.stack_pointer(MUX.SP_INC)
+        self.top(MUX.TOS_RETURN_STACK)
+        self.return_stack_pointer(MUX.RSP_DEC)
+
+    def execute_push(self, opcode: Opcode):
+        self.stack_pointer(MUX.SP_INC)
+        self.datapath.immediate_value = self.argument()
+        self.top(MUX.TOS_IMM)
+
+    def execute_read(self, opcode: Opcode):
+        self.datapath.signal_input(self.datapath.stack[self.datapath.stack_pointer])
+        self.top(MUX.TOS_IN)
+
+    def execute_emit(self, opcode: Opcode):
+        self.return_stack_pointer(MUX.RSP_INC)
+        self.return_stack(MUX.RS_TOS)
+        self.stack_pointer(MUX.SP_DEC)
+        datapath = self.datapath
+        datapath.signal_output(
+            datapath.return_stack[datapath.return_stack_pointer], datapath.stack[datapath.stack_pointer]
+        )
+        self.stack_pointer(MUX.SP_DEC)
+        self.return_stack_pointer(MUX.RSP_DEC)
+
+    def execute_load(self, opcode: Opcode):
+        self.top(MUX.TOS_MEMORY)
+
+    def execute_store(self, opcode: Opcode):
+        datapath = self.datapath
+        datapath.signal_memory_write(datapath.stack[datapath.stack_pointer - 1], datapath.stack[datapath.stack_pointer])
+        self.stack_pointer(MUX.SP_DOUBLE_DEC)
+
+    def execute_loop(self, opcode: Opcode):
+        self.return_stack_pointer(MUX.RSP_DEC)
+        self.return_stack(MUX.RS_INC)
+        if self.datapath.get_loop():
+            self.datapath._pc = self.argument()
+        self.return_stack_pointer(MUX.RSP_LOOP)
+
+    def execute_index(self, opcode: Opcode):
+        self.return_stack_pointer(MUX.RSP_DEC)
+        self.stack_pointer(MUX.SP_INC)
+        self.top(MUX.TOS_RETURN_STACK)
+        self.return_stack_pointer(MUX.RSP_INC)
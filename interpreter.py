@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+from functools import partial
+
+from datapath import DataPath
+from isa import Opcode, Program
+from mc import ALU_OPCODES, mc_memory, opcode_ticks
+
+
+class Interpreter:
+    """Потактово-точная модель, исполняющая инструкцию за одну операцию над DataPath.
+
+    Такты начисляются по таблице из микропрограммы (выборка + шаги исполнения),
+    поэтому `instructions` и `current_tick()` совпадают с микропрограммной моделью.
+    """
+
+    datapath: DataPath = None
+    program: list[tuple] = None
+    instructions: int = None
+
+    _tick: int = None
+
+    def __init__(self, code: Program, datapath: DataPath, microcode: list = mc_memory):
+        self.datapath = datapath
+        self.instructions = 0
+        self._tick = 0
+        ticks = opcode_ticks(microcode)
+        handlers = {opcode: self.handler(opcode) for opcode in set(code.opcodes)}
+        self.program = [
+            (handlers[opcode], datapath.word(arg), ticks[opcode]) for opcode, arg in zip(code.opcodes, code.args)
+        ]
+
+    def current_tick(self):
+        return self._tick
+
+    def handler(self, opcode: Opcode):
+        if opcode in ALU_OPCODES:
+            return partial(self.execute_alu, self.datapath.alu_operations[ALU_OPCODES[opcode]])
+        return {
+            Opcode.NOP: self.execute_nop,
+            Opcode.HALT: self.execute_halt,
+            Opcode.JMP: self.execute_jmp,
+            Opcode.ZJMP: self.execute_zjmp,
+            Opcode.CALL: self.execute_call,
+            Opcode.RET: self.execute_ret,
+            Opcode.DROP: self.execute_drop,
+            Opcode.DUP: self.execute_dup,
+            Opcode.POP: self.execute_pop,
+            Opcode.RPOP: self.execute_rpop,
+            Opcode.PUSH: self.execute_push,
+            Opcode.READ: self.execute_read,
+            Opcode.EMIT: self.execute_emit,
+            Opcode.OVER: self.execute_over,
+            Opcode.LOAD: self.execute_load,
+            Opcode.STORE: self.execute_store,
+            Opcode.SWAP: self.execute_swap,
+            Opcode.LOOP: self.execute_loop,
+            Opcode.INDEX: self.execute_index,
+        }[opcode]
+
+    def run(self, tick_limit: int):
+        """Исполняет программу до HALT или до исчерпания тактов.
+
+        Инструкция, не уложившаяся в лимит, засчитывается, но не исполняется,
+        а счётчик тактов останавливается ровно на лимите.
+        """
+        datapath = self.datapath
+        program = self.program
+        tick = self._tick
+        instructions = self.instructions
+        try:
+            while tick < tick_limit:
+                execute, arg, ticks = program[datapath._pc + 1]
+                instructions += 1
+                tick += ticks
+                if tick > tick_limit:
+                    tick = tick_limit
+                    break
+                datapath._pc += 1
+                execute(arg)
+        except StopIteration:
+            pass
+        finally:
+            self._tick = tick
+            self.instructions = instructions
+
+    # Instructions
+
+    def execute_alu(self, operation, arg):
+        datapath = self.datapath
+        sp = datapath.stack_pointer
+        datapath.stack[sp - 1] = operation(datapath.stack[sp - 1], datapath.stack[sp])
+        datapath.stack_pointer = sp - 1
+
+    def execute_nop(self, arg):
+        pass
+
+    def execute_halt(self, arg):
+        raise StopIteration("Halt!")
+
+    def execute_jmp(self, arg):
+        self.datapath._pc = arg
+
+    def execute_zjmp(self, arg):
+        datapath = self.datapath
+        if datapath.stack[datapath.stack_pointer] != 0:
+            datapath._pc = arg
+        datapath.stack_pointer -= 1
+
+    def execute_call(self, arg):
+        datapath = self.datapath
+        datapath.return_stack_pointer += 1
+        datapath.return_stack[datapath.return_stack_pointer] = datapath._pc
+        datapath._pc = arg
+
+    def execute_ret(self, arg):
+        datapath = self.datapath
+        datapath._pc = datapath.return_stack[datapath.return_stack_pointer]
+        datapath.return_stack_pointer -= 1
+
+    def execute_drop(self, arg):
+        self.datapath.stack_pointer -= 1
+
+    def execute_dup(self, arg):
+        datapath = self.datapath
+        sp = datapath.stack_pointer
+        datapath.return_stack[datapath.return_stack_pointer + 1] = datapath.stack[sp]
+        datapath.stack[sp + 1] = datapath.stack[sp]
+        datapath.stack_pointer = sp + 1
+
+    def execute_pop(self, arg):
+        datapath = self.datapath
+        datapath.return_stack_pointer += 1
+        datapath.return_stack[datapath.return_stack_pointer] = datapath.stack[datapath.stack_pointer]
+        datapath.stack_pointer -= 1
+
+    def execute_rpop(self, arg):
+        datapath = self.datapath
+        datapath.stack_pointer += 1
+        datapath.stack[datapath.stack_pointer] = datapath.return_stack[datapath.return_stack_pointer]
+        datapath.return_stack_pointer -= 1
+
+    def execute_push(self, arg):
+        datapath = self.datapath
+        datapath.stack_pointer += 1
+        datapath.stack[datapath.stack_pointer] = arg
+
+    def execute_read(self, arg):
+        datapath = self.datapath
+        datapath.signal_input(datapath.stack[datapath.stack_pointer])
+        datapath.stack[datapath.stack_pointer] = ord(datapath.input_value)
+
+    def execute_emit(self, arg):
+        datapath = self.datapath
+        sp = datapath.stack_pointer
+        port = datapath.stack[sp]
+        datapath.return_stack[datapath.return_stack_pointer + 1] = port
+        datapath.signal_output(port, datapath.stack[sp - 1])
+        datapath.stack_pointer = sp - 2
+
+    def execute_over(self, arg):
+        datapath = self.datapath
+        sp = datapath.stack_pointer
+        datapath.return_stack[datapath.return_stack_pointer + 1] = datapath.stack[sp - 1]
+        datapath.stack[sp + 1] = datapath.stack[sp - 1]
+        datapath.stack_pointer = sp + 1
+
+    def execute_load(self, arg):
+        datapath = self.datapath
+        sp = datapath.stack_pointer
+        datapath.stack[sp] = datapath.memory[datapath.stack[sp]]
+
+    def execute_store(self, arg):
+        datapath = self.datapath
+        sp = datapath.stack_pointer
+        datapath.memory[datapath.stack[sp - 1]] = datapath.stack[sp]
+        datapath.stack_pointer = sp - 2
+
+    def execute_swap(self, arg):
+        datapath = self.datapath
+        sp = datapath.stack_pointer
+        rsp = datapath.return_stack_pointer
+        top, next_ = datapath.stack[sp], datapath.stack[sp - 1]
+        datapath.return_stack[rsp + 1] = top
+        datapath.return_stack[rsp + 2] = next_
+        datapath.stack[sp] = next_
+        datapath.stack[sp - 1] = top
+
+    def execute_loop(self, arg):
+        datapath = self.datapath
+        rsp = datapath.return_stack_pointer - 1
+        datapath.return_stack[rsp] += 1
+        if datapath.return_stack[rsp + 1] > datapath.return_stack[rsp]:
+            datapath._pc = arg
+            datapath.return_stack_pointer = rsp + 1
+        else:
+            datapath.return_stack_pointer = rsp - 1
+
+    def execute_index(self, arg):
+        datapath = self.datapath
+        datapath.stack_pointer += 1
+        datapath.stack[datapath.stack_pointer] = datapath.return_stack[datapath.return_stack_pointer - 1]
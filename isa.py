@@ -1,15 +1,30 @@
 from __future__ import annotations
 
 import json
+import mmap
+import struct
+from array import array
 from enum import Enum
 
 STACK_SIZE = 1024
 MEMORY_SIZE = 2048
 
+BINARY_MAGIC = b"FRTH"
+BINARY_VERSION = 1
+
+# Заголовок: сигнатура, версия, флаги, число инструкций, число инициализированных ячеек памяти
+BINARY_HEADER = struct.Struct("<4sHHII")
+# Машинное слово команды (40 бит): опкод (старший бит - наличие аргумента), аргумент
+BINARY_INSTRUCTION = struct.Struct("<Bi")
+# Инициализированная ячейка памяти данных: адрес, значение
+BINARY_MEMORY_CELL = struct.Struct("<Ii")
+BINARY_HAS_ARG = 0x80
+
 
 class ArgType(str, Enum):
     CONST = "const"
     ADD = "add"
+    LABEL = "label"
     UNDEFINED = "undefined"
 
     def __str__(self):
@@ -57,6 +72,8 @@ class Opcode(str, Enum):
     RET = "ret"
     NOP = "nop"
     HALT = "halt"
+    LOOP = "loop"
+    INDEX = "index"
 
     def __str__(self):
         return str(self.value)
@@ -102,6 +119,41 @@ class Instruction:
         return f"{self.opcode} {self.arg}"
 
 
+class Program:
+    """Программа в виде параллельных плоских массивов (struct of arrays)"""
+
+    opcodes: list[Opcode]
+    "Опкод каждой инструкции"
+
+    args: array
+    "Аргумент каждой инструкции (0, если аргумента нет)"
+
+    has_arg: bytearray
+    "Признак наличия аргумента"
+
+    def __init__(self, opcodes: list[Opcode], args: array, has_arg: bytearray):
+        self.opcodes = opcodes
+        self.args = args
+        self.has_arg = has_arg
+
+    def __len__(self):
+        return len(self.opcodes)
+
+    def instruction(self, index: int) -> Instruction:
+        """Восстановить инструкцию по индексу (для журнала и отладки)"""
+        arg = Arg(ArgType.CONST, self.args[index]) if self.has_arg[index] else None
+        return Instruction(self.opcodes[index], arg)
+
+
+def to_program(code: list[Instruction]) -> Program:
+    """Разложить список инструкций в параллельные массивы"""
+    return Program(
+        [instruction.opcode for instruction in code],
+        array("q", [instruction.arg.value if instruction.arg is not None else 0 for instruction in code]),
+        bytearray(instruction.arg is not None for instruction in code),
+    )
+
+
 def write_code(filename: str, code: list[Instruction], memory):
     """Записать память и код из инструкций в файл."""
     ans = dict({"memory": memory, "code": code})
@@ -109,8 +161,50 @@ def write_code(filename: str, code: list[Instruction], memory):
         json.dump(ans, file, indent=4, default=lambda o: o.__dict__)
 
 
-def read_code(filename: str) -> list[Instruction]:
-    """Прочесть машинный код из файла"""
+def write_binary_code(filename: str, code: list[dict], memory: dict):
+    """Записать память и код в двоичный формат: заголовок, слова команд, секция памяти"""
+    opcodes = list(Opcode)
+    with open(filename, "wb") as file:
+        file.write(BINARY_HEADER.pack(BINARY_MAGIC, BINARY_VERSION, 0, len(code), len(memory)))
+        for command in code:
+            opcode = opcodes.index(command["command"])
+            if "arg" in command:
+                file.write(BINARY_INSTRUCTION.pack(opcode | BINARY_HAS_ARG, command["arg"]))
+            else:
+                file.write(BINARY_INSTRUCTION.pack(opcode, 0))
+        for address, value in memory.items():
+            file.write(BINARY_MEMORY_CELL.pack(int(address), value))
+
+
+def read_binary_code(filename: str) -> tuple[Program, dict]:
+    """Отобразить двоичный файл в память (mmap) и сразу декодировать его в массивы программы"""
+    opcodes = list(Opcode)
+    with open(filename, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        magic, version, _, code_size, memory_size = BINARY_HEADER.unpack_from(data)
+        assert magic == BINARY_MAGIC, "Not a binary machine code file: " + filename
+        assert version == BINARY_VERSION, f"Unsupported binary format version {version}"
+        code_start = BINARY_HEADER.size
+        memory_start = code_start + code_size * BINARY_INSTRUCTION.size
+        memory_end = memory_start + memory_size * BINARY_MEMORY_CELL.size
+        words = list(BINARY_INSTRUCTION.iter_unpack(data[code_start:memory_start]))
+        code = Program(
+            [opcodes[opcode & ~BINARY_HAS_ARG] for opcode, _ in words],
+            array("q", [arg for _, arg in words]),
+            bytearray(bool(opcode & BINARY_HAS_ARG) for opcode, _ in words),
+        )
+        memory = dict(BINARY_MEMORY_CELL.iter_unpack(data[memory_start:memory_end]))
+    return code, memory
+
+
+def is_binary_code(filename: str) -> bool:
+    with open(filename, "rb") as file:
+        return file.read(len(BINARY_MAGIC)) == BINARY_MAGIC
+
+
+def read_code(filename: str) -> tuple[Program, dict]:
+    """Прочесть машинный код из файла (JSON или двоичный формат)"""
+    if is_binary_code(filename):
+        return read_binary_code(filename)
     with open(filename, encoding="utf-8") as file:
         json_objects = json.loads(file.read())
     code: list[Instruction] = []
@@ -124,4 +218,4 @@ def read_code(filename: str) -> list[Instruction]:
         except KeyError:
             pass
         code.append(Instruction(opcode, arg))
-    return code, memory
+    return to_program(code), memory
@@ -0,0 +1,213 @@
+from __future__ import annotations
+
+from datapath import ALU_OPERATIONS, DataPath
+from interpreter import Interpreter
+from isa import Opcode, Program
+from mc import ALU_OPCODES, mc_memory, opcode_ticks
+
+TERMINATORS = {Opcode.JMP, Opcode.ZJMP, Opcode.CALL, Opcode.RET, Opcode.LOOP}
+"Инструкции, завершающие базовый блок (входят в блок)"
+
+INTERPRETED = {Opcode.READ, Opcode.EMIT, Opcode.HALT}
+"Инструкции, исполняемые интерпретатором (обрывают блок перед собой)"
+
+ALU_EXPRESSIONS = {
+    Opcode.ADD: "{left} + {right}",
+    Opcode.SUB: "{left} - {right}",
+    Opcode.MUL: "{left} * {right}",
+    Opcode.DIV: "{left} / {right}",
+    Opcode.MOD: "{left} % {right}",
+    Opcode.EQ: "-1 if {left} == {right} else 0",
+    Opcode.GR: "-1 if {left} > {right} else 0",
+    Opcode.LS: "-1 if {left} < {right} else 0",
+}
+
+
+def offset(base: str, delta: int) -> str:
+    if delta > 0:
+        return f"{base} + {delta}"
+    if delta < 0:
+        return f"{base} - {-delta}"
+    return base
+
+
+class BlockCompiler:
+    """Генерирует исходный код базового блока на Python.
+
+    Смещения SP и RSP внутри блока отслеживаются на этапе компиляции,
+    поэтому обращения к стекам идут по константным сдвигам от значений на входе.
+    Без `inline_alu` операции АЛУ - вызовы `alu_<opcode>` из пространства имён блока
+    (операции тракта с машинными словами).
+    """
+
+    lines: list[str] = None
+    sp: int = None
+    rsp: int = None
+    inline_alu: bool = None
+
+    def __init__(self, inline_alu: bool = True):
+        self.lines = []
+        self.sp = 0
+        self.rsp = 0
+        self.inline_alu = inline_alu
+
+    def top(self, delta: int = 0) -> str:
+        return f"s[{offset('sp', self.sp + delta)}]"
+
+    def return_top(self, delta: int = 0) -> str:
+        return f"rs[{offset('rsp', self.rsp + delta)}]"
+
+    def emit(self, line: str):
+        self.lines.append("    " + line)
+
+    def instruction(self, pc: int, opcode: Opcode, arg: int):  # noqa: C901
+        if opcode in ALU_EXPRESSIONS:
+            template = ALU_EXPRESSIONS[opcode] if self.inline_alu else f"alu_{opcode.value}({{left}}, {{right}})"
+            expression = template.format(left=self.top(-1), right=self.top())
+            self.emit(f"{self.top(-1)} = {expression}")
+            self.sp -= 1
+        elif opcode is Opcode.PUSH:
+            self.sp += 1
+            self.emit(f"{self.top()} = {arg}")
+        elif opcode is Opcode.DROP:
+            self.sp -= 1
+        elif opcode is Opcode.DUP:
+            self.emit(f"{self.return_top(1)} = {self.top(1)} = {self.top()}")
+            self.sp += 1
+        elif opcode is Opcode.OVER:
+            self.emit(f"{self.return_top(1)} = {self.top(1)} = {self.top(-1)}")
+            self.sp += 1
+        elif opcode is Opcode.SWAP:
+            self.emit(f"{self.return_top(1)} = t = {self.top()}")
+            self.emit(f"{self.return_top(2)} = {self.top()} = {self.top(-1)}")
+            self.emit(f"{self.top(-1)} = t")
+        elif opcode is Opcode.POP:
+            self.rsp += 1
+            self.emit(f"{self.return_top()} = {self.top()}")
+            self.sp -= 1
+        elif opcode is Opcode.RPOP:
+            self.sp += 1
+            self.emit(f"{self.top()} = {self.return_top()}")
+            self.rsp -= 1
+        elif opcode is Opcode.INDEX:
+            self.sp += 1
+            self.emit(f"{self.top()} = {self.return_top(-1)}")
+        elif opcode is Opcode.LOAD:
+            self.emit(f"{self.top()} = m[{self.top()}]")
+        elif opcode is Opcode.STORE:
+            self.emit(f"m[{self.top(-1)}] = {self.top()}")
+            self.sp -= 2
+        else:
+            self.control(pc, opcode, arg)
+
+    def control(self, pc: int, opcode: Opcode, arg: int):
+        if opcode is Opcode.JMP:
+            self.emit(f"dp._pc = {arg}")
+        elif opcode is Opcode.ZJMP:
+            self.emit(f"dp._pc = {arg} if {self.top()} != 0 else {pc}")
+            self.sp -= 1
+        elif opcode is Opcode.CALL:
+            self.rsp += 1
+            self.emit(f"{self.return_top()} = {pc}")
+            self.emit(f"dp._pc = {arg}")
+        elif opcode is Opcode.RET:
+            self.emit(f"dp._pc = {self.return_top()}")
+            self.rsp -= 1
+        elif opcode is Opcode.LOOP:
+            self.emit(f"{self.return_top(-1)} += 1")
+            self.emit(f"if {self.return_top()} > {self.return_top(-1)}:")
+            self.emit(f"    dp._pc = {arg}")
+            self.emit("else:")
+            self.emit(f"    dp._pc = {pc}")
+            self.emit("    rsp -= 2")
+
+    def source(self, name: str) -> str:
+        return "\n".join(
+            [
+                f"def {name}(dp):",
+                "    s = dp.stack",
+                "    rs = dp.return_stack",
+                "    m = dp.memory",
+                "    sp = dp.stack_pointer",
+                "    rsp = dp.return_stack_pointer",
+                *self.lines,
+                f"    dp.stack_pointer = {offset('sp', self.sp)}",
+                f"    dp.return_stack_pointer = {offset('rsp', self.rsp)}",
+                "",
+            ]
+        )
+
+
+class JitEngine(Interpreter):
+    """Модель с компиляцией базовых блоков в функции Python.
+
+    Блок - последовательность инструкций от точки входа до JMP/ZJMP/CALL/RET/LOOP включительно.
+    Блок компилируется один раз (исходный код + `compile()`) и кэшируется по PC начала.
+    Ввод-вывод и HALT исполняются интерпретатором. Такты блока - сумма тактов
+    его инструкций, так что вывод и счётчики совпадают с микропрограммной моделью.
+    """
+
+    code: Program = None
+    ticks: dict[Opcode, int] = None
+    blocks: dict[int, tuple | None] = None
+
+    def __init__(self, code: Program, datapath: DataPath, microcode: list = mc_memory):
+        super().__init__(code, datapath, microcode)
+        self.code = code
+        self.ticks = opcode_ticks(microcode)
+        self.blocks = {}
+
+    def compile_block(self, start: int) -> tuple | None:
+        """Функция блока, число инструкций и тактов в нём; None, если блок пуст"""
+        operations = self.datapath.alu_operations
+        compiler = BlockCompiler(inline_alu=operations is ALU_OPERATIONS)
+        pc = start
+        ticks = 0
+        while pc < len(self.code) and self.code.opcodes[pc] not in INTERPRETED:
+            opcode = self.code.opcodes[pc]
+            compiler.instruction(pc, opcode, self.datapath.word(self.code.args[pc]))
+            ticks += self.ticks[opcode]
+            pc += 1
+            if opcode in TERMINATORS:
+                break
+        else:
+            compiler.emit(f"dp._pc = {pc - 1}")
+        if pc == start:
+            return None
+
+        name = f"block_{start}"
+        namespace = {f"alu_{opcode.value}": operations[alu] for opcode, alu in ALU_OPCODES.items()}
+        exec(compile(compiler.source(name), f"<jit {name}>", "exec"), namespace)
+        return namespace[name], pc - start, ticks
+
+    def run(self, tick_limit: int):
+        datapath = self.datapath
+        program = self.program
+        blocks = self.blocks
+        tick = self._tick
+        instructions = self.instructions
+        try:
+            while tick < tick_limit:
+                start = datapath._pc + 1
+                if start not in blocks:
+                    blocks[start] = self.compile_block(start)
+                block = blocks[start]
+                if block is not None and tick + block[2] <= tick_limit:
+                    block[0](datapath)
+                    instructions += block[1]
+                    tick += block[2]
+                    continue
+
+                execute, arg, ticks = program[start]
+                instructions += 1
+                tick += ticks
+                if tick > tick_limit:
+                    tick = tick_limit
+                    break
+                datapath._pc = start
+                execute(arg)
+        except StopIteration:
+            pass
+        finally:
+            self._tick = tick
+            self.instructions = instructions
@@ -0,0 +1,248 @@
+from __future__ import annotations
+
+from exceptions import MissingDependencyError, UnknownOpcodeError
+from isa import MEMORY_SIZE, STACK_SIZE, Opcode, Program
+from mc import mc_memory, opcode_ticks
+from ports import OUTPUT_PORT, render_value
+
+try:
+    import numpy as np
+except ImportError:  # numpy - необязательная зависимость (`poetry install --extras lockstep`)
+    np = None
+
+OPCODES = list(Opcode)
+
+
+class LockstepEngine:
+    """N копий одной программы, исполняемых синхронно над массивами NumPy.
+
+    Стеки, память, SP/RSP, PC и счётчики хранятся массивами формы (N, размер) с той же
+    раскладкой, что у `DataPath`. На каждом шаге экземпляры группируются по опкоду под PC,
+    и инструкция применяется сразу ко всей группе (маска по индексам), поэтому расхождение
+    по ветвлениям и остановка отдельных экземпляров не требуют отдельного цикла.
+
+    Такты и число инструкций считаются как в `Interpreter`. Отличие от модели `mc`:
+    ячейки целочисленные (int64), DIV - деление с округлением вниз; мусор выше RSP,
+    который оставляют DUP/OVER/SWAP/EMIT, не воспроизводится (он не наблюдаем).
+    """
+
+    count: int = None
+    opcodes = None
+    args = None
+    ticks = None
+    stack = None
+    return_stack = None
+    memory = None
+    stack_pointer = None
+    return_stack_pointer = None
+    pc = None
+    tick = None
+    instructions = None
+    done = None
+    inputs = None
+    input_lengths = None
+    input_positions = None
+    outputs: list[list[int]] = None
+
+    def __init__(
+        self,
+        code: Program,
+        memory: dict,
+        inputs: list[str],
+        microcode: list = mc_memory,
+        memory_size: int = MEMORY_SIZE,
+    ):
+        if np is None:
+            raise MissingDependencyError("numpy", "lockstep")
+        self.count = len(inputs)
+        table = opcode_ticks(microcode)
+        numbers = {opcode: number for number, opcode in enumerate(OPCODES)}
+        self.opcodes = np.array([numbers[opcode] for opcode in code.opcodes], dtype=np.int64)
+        self.args = np.array(code.args, dtype=np.int64)
+        self.ticks = np.array([table.get(opcode, 0) for opcode in OPCODES], dtype=np.int64)[self.opcodes]
+
+        shape = (self.count,)
+        self.stack = np.zeros((self.count, STACK_SIZE), dtype=np.int64)
+        self.return_stack = np.zeros((self.count, STACK_SIZE), dtype=np.int64)
+        self.memory = np.zeros((self.count, memory_size), dtype=np.int64)
+        for address, value in memory.items():
+            self.memory[:, int(address)] = value
+        self.stack_pointer = np.full(shape, -1, dtype=np.int64)
+        self.return_stack_pointer = np.full(shape, -1, dtype=np.int64)
+        self.pc = np.full(shape, -1, dtype=np.int64)
+        self.tick = np.zeros(shape, dtype=np.int64)
+        self.instructions = np.zeros(shape, dtype=np.int64)
+        self.done = np.zeros(shape, dtype=bool)
+
+        width = max((len(text) for text in inputs), default=0) + 1
+        self.inputs = np.zeros((self.count, width), dtype=np.int64)
+        for index, text in enumerate(inputs):
+            self.inputs[index, : len(text)] = [ord(char) for char in text]
+        self.input_lengths = np.array([len(text) for text in inputs], dtype=np.int64)
+        self.input_positions = np.zeros(shape, dtype=np.int64)
+        self.outputs = [[] for _ in inputs]
+
+    def run(self, tick_limit: int) -> list[tuple[str, int, int]]:
+        """Исполняет все экземпляры до HALT или лимита тактов: (вывод, инструкции, такты) для каждого"""
+        handlers = {number: self.decoder(OPCODES[number]) for number in np.unique(self.opcodes).tolist()}
+        while True:
+            active = np.flatnonzero(~self.done)
+            if active.size == 0:
+                break
+            pc = self.pc[active] + 1
+            cost = self.ticks[pc]
+            self.instructions[active] += 1
+            over = self.tick[active] + cost > tick_limit
+            self.tick[active[over]] = tick_limit
+            self.done[active[over]] = True
+            active, pc, cost = active[~over], pc[~over], cost[~over]
+            self.tick[active] += cost
+            self.pc[active] = pc
+            self.done[active[self.tick[active] >= tick_limit]] = True
+
+            opcodes = self.opcodes[pc]
+            for number in np.unique(opcodes).tolist():
+                selected = opcodes == number
+                handlers[number](active[selected], self.args[pc[selected]])
+        return [
+            ("".join(map(render_value, output)), int(instructions), int(tick))
+            for output, instructions, tick in zip(self.outputs, self.instructions, self.tick)
+        ]
+
+    def decoder(self, opcode: Opcode):
+        handler = getattr(self, f"execute_{opcode.value}", None)
+        if handler is None:
+            raise UnknownOpcodeError(opcode)
+        return handler
+
+    # Инструкции: index - номера экземпляров, arg - аргументы инструкции у каждого из них
+
+    def binary(self, index, operation):
+        sp = self.stack_pointer[index]
+        self.stack[index, sp - 1] = operation(self.stack[index, sp - 1], self.stack[index, sp])
+        self.stack_pointer[index] = sp - 1
+
+    def execute_add(self, index, arg):
+        self.binary(index, np.add)
+
+    def execute_sub(self, index, arg):
+        self.binary(index, np.subtract)
+
+    def execute_mul(self, index, arg):
+        self.binary(index, np.multiply)
+
+    def execute_div(self, index, arg):
+        if np.any(self.stack[index, self.stack_pointer[index]] == 0):
+            raise ZeroDivisionError
+        self.binary(index, np.floor_divide)
+
+    def execute_mod(self, index, arg):
+        if np.any(self.stack[index, self.stack_pointer[index]] == 0):
+            raise ZeroDivisionError
+        self.binary(index, np.mod)
+
+    def execute_eq(self, index, arg):
+        self.binary(index, lambda left, right: np.where(left == right, -1, 0))
+
+    def execute_gr(self, index, arg):
+        self.binary(index, lambda left, right: np.where(left > right, -1, 0))
+
+    def execute_ls(self, index, arg):
+        self.binary(index, lambda left, right: np.where(left < right, -1, 0))
+
+    def execute_nop(self, index, arg):
+        pass
+
+    def execute_halt(self, index, arg):
+        self.done[index] = True
+
+    def execute_jmp(self, index, arg):
+        self.pc[index] = arg
+
+    def execute_zjmp(self, index, arg):
+        sp = self.stack_pointer[index]
+        self.pc[index] = np.where(self.stack[index, sp] != 0, arg, self.pc[index])
+        self.stack_pointer[index] = sp - 1
+
+    def execute_call(self, index, arg):
+        rsp = self.return_stack_pointer[index] + 1
+        self.return_stack[index, rsp] = self.pc[index]
+        self.return_stack_pointer[index] = rsp
+        self.pc[index] = arg
+
+    def execute_ret(self, index, arg):
+        rsp = self.return_stack_pointer[index]
+        self.pc[index] = self.return_stack[index, rsp]
+        self.return_stack_pointer[index] = rsp - 1
+
+    def execute_drop(self, index, arg):
+        self.stack_pointer[index] -= 1
+
+    def execute_dup(self, index, arg):
+        sp = self.stack_pointer[index]
+        self.stack[index, sp + 1] = self.stack[index, sp]
+        self.stack_pointer[index] = sp + 1
+
+    def execute_over(self, index, arg):
+        sp = self.stack_pointer[index]
+        self.stack[index, sp + 1] = self.stack[index, sp - 1]
+        self.stack_pointer[index] = sp + 1
+
+    def execute_swap(self, index, arg):
+        sp = self.stack_pointer[index]
+        top = self.stack[index, sp]
+        self.stack[index, sp] = self.stack[index, sp - 1]
+        self.stack[index, sp - 1] = top
+
+    def execute_pop(self, index, arg):
+        sp = self.stack_pointer[index]
+        rsp = self.return_stack_pointer[index] + 1
+        self.return_stack[index, rsp] = self.stack[index, sp]
+        self.return_stack_pointer[index] = rsp
+        self.stack_pointer[index] = sp - 1
+
+    def execute_rpop(self, index, arg):
+        sp = self.stack_pointer[index] + 1
+        rsp = self.return_stack_pointer[index]
+        self.stack[index, sp] = self.return_stack[index, rsp]
+        self.stack_pointer[index] = sp
+        self.return_stack_pointer[index] = rsp - 1
+
+    def execute_push(self, index, arg):
+        sp = self.stack_pointer[index] + 1
+        self.stack[index, sp] = arg
+        self.stack_pointer[index] = sp
+
+    def execute_read(self, index, arg):
+        position = self.input_positions[index]
+        self.stack[index, self.stack_pointer[index]] = self.inputs[index, position]
+        self.input_positions[index] = np.minimum(position + 1, self.input_lengths[index])
+
+    def execute_emit(self, index, arg):
+        sp = self.stack_pointer[index]
+        ports = self.stack[index, sp]
+        assert np.all(ports == OUTPUT_PORT), "Unknown output port"
+        for instance, value in zip(index.tolist(), self.stack[index, sp - 1].tolist()):
+            self.outputs[instance].append(value)
+        self.stack_pointer[index] = sp - 2
+
+    def execute_load(self, index, arg):
+        sp = self.stack_pointer[index]
+        self.stack[index, sp] = self.memory[index, self.stack[index, sp]]
+
+    def execute_store(self, index, arg):
+        sp = self.stack_pointer[index]
+        self.memory[index, self.stack[index, sp - 1]] = self.stack[index, sp]
+        self.stack_pointer[index] = sp - 2
+
+    def execute_loop(self, index, arg):
+        rsp = self.return_stack_pointer[index] - 1
+        self.return_stack[index, rsp] += 1
+        repeat = self.return_stack[index, rsp + 1] > self.return_stack[index, rsp]
+        self.pc[index] = np.where(repeat, arg, self.pc[index])
+        self.return_stack_pointer[index] = np.where(repeat, rsp + 1, rsp - 1)
+
+    def execute_index(self, index, arg):
+        sp = self.stack_pointer[index] + 1
+        self.stack[index, sp] = self.return_stack[index, self.return_stack_pointer[index] - 1]
+        self.stack_pointer[index] = sp
@@ -0,0 +1,31 @@
+import tempfile
+
+import machine
+import pytest
+from engine_test import translate
+
+np = pytest.importorskip("numpy")
+
+from lockstep import LockstepEngine  # noqa: E402
+
+INPUTS = ["", "a", "Alice\n", "Bob", "Cat, dog - bird : nothing"]
+
+
+@pytest.mark.parametrize("source", ["forth/cat.fth", "forth/hello_user_name.fth", "forth/prob2.fth"])
+@pytest.mark.parametrize("tick_limit", [53, 1000, 7000])
+def test_lockstep_matches_microcode(source, tick_limit, monkeypatch):
+    monkeypatch.setattr(machine, "TICK_LIMIT", tick_limit)
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        code, memory = translate(source, tmpdirname)
+
+    results = LockstepEngine(code, memory, INPUTS).run(tick_limit)
+
+    assert results == [machine.simulation(code, [*text, chr(0)], memory, "mc") for text in INPUTS]
+
+
+def test_lockstep_loop_superinstructions():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        code, memory = translate("forth/loop.fth", tmpdirname)
+
+    expected = machine.simulation(code, [], memory, "mc")
+    assert LockstepEngine(code, memory, ["", ""]).run(machine.TICK_LIMIT) == [expected, expected]
@@ -1,54 +1,159 @@
+import argparse
+import contextlib
 import logging
 import sys
 
-from control_unit import ControlUnit
-from datapath import DataPath
-from isa import read_code
-from mc import mc_memory
+from control_unit import ControlUnit, PipelinedControlUnit
+from datapath import CompactDataPath, DataPath, RegisterDataPath
+from hardwired import HardwiredControlUnit
+from interpreter import Interpreter
+from isa import MEMORY_SIZE, Program, read_code, to_program
+from jit import JitEngine
+from mc import mc_memory, register_mc_memory
+from ports import OUTPUT_PORT, InputPort, OutputPort
+from tracer import TRACE_SINKS, TraceSink, make_trace_sink
 
 TICK_LIMIT = 7000
 
+INSTRUCTION_ENGINES = {"fast": Interpreter, "jit": JitEngine}
 
-def simulation(code: list, input_tokens: list, memory: dict):
-    datapath = DataPath(input_tokens)
-    datapath.fill_memory(memory)
-    control_unit = ControlUnit(code, datapath)
-    logging.debug(repr(control_unit))
-    instructions = 0
+# Модели с собственным подсчётом тактов: вывод и число инструкций совпадают с mc, такты - нет
+TIMING_MODELS = {"pipeline": PipelinedControlUnit, "hardwired": HardwiredControlUnit}
+
+CONTROL_UNITS = {"mc": ControlUnit, **INSTRUCTION_ENGINES, **TIMING_MODELS}
+ENGINES = ["mc", *INSTRUCTION_ENGINES, *TIMING_MODELS]
+
+# Конфигурация тракта данных и соответствующая ей микропрограмма
+DATAPATHS = {
+    "stack": (DataPath, mc_memory),
+    "register": (RegisterDataPath, register_mc_memory),
+    "compact": (CompactDataPath, mc_memory),
+}
+
+
+def simulation(
+    code: Program | list,
+    input_tokens: InputPort | list,
+    memory: dict,
+    engine: str = "mc",
+    trace: TraceSink | None = None,
+    output_port: OutputPort | None = None,
+    datapath_kind: str = "stack",
+    memory_size: int = MEMORY_SIZE,
+    memory_file: str | None = None,
+):
+    if not isinstance(code, Program):
+        code = to_program(code)
+    datapath_class, microcode = DATAPATHS[datapath_kind]
+    datapath = datapath_class(input_tokens, output_port, memory_size, memory_file)
     try:
-        while control_unit.current_tick() < TICK_LIMIT:
-            if control_unit.mpc == 0:
-                instructions += 1
-            control_unit.dispatch_micro_instruction(mc_memory[control_unit.mpc])
-            logging.debug(repr(control_unit))
-    except StopIteration:
-        pass
+        datapath.fill_memory(memory)
+        datapath.trace = trace
+        control_unit = CONTROL_UNITS[engine](code, datapath, microcode)
+        if trace is not None and engine == "mc":
+            trace.tick(control_unit)
+        control_unit.run(TICK_LIMIT)
+    finally:
+        datapath.close()
+    return simulation_result(control_unit)
 
+
+def simulation_result(control_unit) -> tuple[str, int, int]:
+    """Вывод, число инструкций и тактов остановившейся модели"""
     if control_unit.current_tick() == TICK_LIMIT:
         logging.warning("Tick Limit!")
+    if isinstance(control_unit, PipelinedControlUnit):
+        logging.info(f"stalls: {control_unit.stalls} flushes: {control_unit.flushes}")
 
-    out = "".join(map(lambda x: chr(x) if x > 9 and x <= 255 else str(x), datapath._io[11]))
+    out = control_unit.datapath._io[OUTPUT_PORT].text()
     logging.debug("OUTPUT: " + out)
-    return out, instructions, control_unit.current_tick()
+    return out, control_unit.instructions, control_unit.current_tick()
+
+
+def open_output_port(output_file: str | None, stack: contextlib.ExitStack) -> OutputPort | None:
+    """Порт вывода, сразу пишущий в stdout (`-`) или файл, без накопления буфера"""
+    if output_file is None:
+        return None
+    if output_file == "-":
+        return OutputPort(sys.stdout, keep=False)
+    return OutputPort(stack.enter_context(open(output_file, "w", encoding="utf-8")), keep=False)
 
 
-def main(code_file: str, input_file: str):
+def main(
+    code_file: str,
+    input_file: str,
+    engine: str = "mc",
+    trace: str = "auto",
+    trace_file: str | None = None,
+    output_file: str | None = None,
+    datapath_kind: str = "stack",
+    memory_size: int = MEMORY_SIZE,
+    memory_file: str | None = None,
+):
     code, memory = read_code(code_file)
-    if input_file is None:
-        input_tokens = []
-    else:
-        with open(input_file) as f:
-            input_tokens = [*list(f.read()), chr(0)]
-    output, instruction_counter, ticks = simulation(code, input_tokens, memory)
+    with contextlib.ExitStack() as stack:
+        input_port = InputPort(stack.enter_context(open(input_file)) if input_file is not None else None)
+        output_port = open_output_port(output_file, stack)
+        trace_sink = make_trace_sink(trace, trace_file)
+        if trace_sink is not None:
+            stack.callback(trace_sink.close)
+        output, instruction_counter, ticks = simulation(
+            code, input_port, memory, engine, trace_sink, output_port, datapath_kind, memory_size, memory_file
+        )
+    if output_file == "-":
+        print()
     print(f"instr_counter: {instruction_counter} ticks: {ticks}")
 
 
 if __name__ == "__main__":
     logging.getLogger().setLevel(logging.DEBUG)
 
-    assert len(sys.argv) <= 3, "Invalid usage: python3 machine.py <code_file> [<input_file>]"
-    assert len(sys.argv) >= 2, "Invalid usage: python3 machine.py <code_file> [<input_file>]"
-    if len(sys.argv) == 2:
-        main(sys.argv[1], None)
-    else:
-        main(sys.argv[1], sys.argv[2])
+    parser = argparse.ArgumentParser(
+        usage="python3 machine.py <code_file> [<input_file>] [--engine mc|fast|jit|pipeline|hardwired] [--datapath stack|register|compact] "
+        "[--trace text|binary|none] [--memory-size <cells>] [--memory-file <file>]"
+    )
+    parser.add_argument("code_file")
+    parser.add_argument("input_file", nargs="?")
+    parser.add_argument(
+        "--engine",
+        choices=ENGINES,
+        default="mc",
+        help="mc - microcoded model (default), fast - instruction-level model, jit - basic blocks compiled to Python; "
+        "these report the same tick count; pipeline - microcoded execute stage with overlapped fetch, "
+        "hardwired - control signals decoded from the opcode without microprogram memory",
+    )
+    parser.add_argument(
+        "--datapath",
+        choices=list(DATAPATHS),
+        default="stack",
+        help="stack - stack shuffles through the return stack (default), "
+        "register - dedicated TOP/NEXT registers with single-step DUP/OVER/SWAP, "
+        "compact - 32-bit array cells with wraparound and integer division",
+    )
+    parser.add_argument(
+        "--trace",
+        choices=TRACE_SINKS,
+        default="auto",
+        help="per-tick state trace sink (auto - text log when DEBUG logging is enabled)",
+    )
+    parser.add_argument("--trace-file", help="output file for the binary trace")
+    parser.add_argument("--output", help="stream port output to a file or '-' for stdout")
+    parser.add_argument(
+        "--memory-size",
+        type=int,
+        default=MEMORY_SIZE,
+        help=f"data memory size in cells (default {MEMORY_SIZE}), pages are allocated on first write",
+    )
+    parser.add_argument("--memory-file", help="back data memory with a memory-mapped file that keeps it after halt")
+    args = parser.parse_args()
+    main(
+        args.code_file,
+        args.input_file,
+        args.engine,
+        args.trace,
+        args.trace_file,
+        args.output,
+        args.datapath,
+        args.memory_size,
+        args.memory_file,
+    )
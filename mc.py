@@ -1,7 +1,8 @@
+from array import array
 from enum import Enum
 
 from exceptions import UnknownOpcodeError
-from isa import Opcode
+from isa import Opcode, Program
 
 
 class Latch(Enum):
@@ -13,6 +14,7 @@ class Latch(Enum):
     RS = 5
     IR = 6
     SP = 7
+    TOP_NEXT = 8
 
 
 class Halt:
@@ -35,6 +37,19 @@ class ALU(Enum):
     EQ = 7
 
 
+# Операция АЛУ для каждой арифметической инструкции
+ALU_OPCODES = {
+    Opcode.ADD: ALU.ADD,
+    Opcode.SUB: ALU.SUB,
+    Opcode.MUL: ALU.MUL,
+    Opcode.DIV: ALU.DIV,
+    Opcode.MOD: ALU.MOD,
+    Opcode.EQ: ALU.EQ,
+    Opcode.GR: ALU.GR,
+    Opcode.LS: ALU.LS,
+}
+
+
 class MEMORY(Enum):
     WR = 0
     RD = 1
@@ -46,12 +61,16 @@ class MUX(Enum):
     TOS_IN = 2
     TOS_MEMORY = 3
     TOS_IMM = 4
+    TOS_NEXT = 5
+    TOS_STACK = 6
 
     RS_PC = 10
     RS_TOS = 11
+    RS_INC = 12
 
     RSP_INC = 20
     RSP_DEC = 21
+    RSP_LOOP = 22
 
     PC_INC = 30
     PC_ADDR = 31
@@ -67,6 +86,7 @@ class MUX(Enum):
 
     JMP_TYPE_ZERO = 60
     JMP_TYPE_MPC = 61
+    JMP_TYPE_LOOP = 62
 
 
 mc_memory = [
@@ -201,6 +221,22 @@ mc_memory = [
     [MUX.MPC_ZERO, Latch.MPC, MUX.TOS_RETURN_STACK, Latch.NEXT, MUX.RSP_DEC, Latch.RSP],
     # 36 MOD
     [MUX.MPC_ZERO, Latch.MPC, ALU.MOD, MUX.TOS_ALU, Latch.NEXT, MUX.SP_DEC, Latch.SP],
+    # 37 LOOP: RS[RSP] - граница цикла, RS[RSP - 1] - счётчик
+    [MUX.MPC_INC, Latch.MPC, MUX.RSP_DEC, Latch.RSP, MUX.RS_INC, Latch.RS],
+    [MUX.MPC_ZERO, Latch.MPC, MUX.JMP_TYPE_LOOP, Latch.PC, MUX.RSP_LOOP, Latch.RSP],
+    # 39 INDEX
+    [
+        MUX.MPC_ZERO,
+        Latch.MPC,
+        MUX.RSP_DEC,
+        Latch.RSP,
+        MUX.SP_INC,
+        Latch.SP,
+        MUX.TOS_RETURN_STACK,
+        Latch.TOP,
+        MUX.RSP_INC,
+        Latch.RSP,
+    ],
 ]
 
 
@@ -256,5 +292,54 @@ def opcode_to_mpc(opcode: Opcode) -> int:
             return 32
         case Opcode.MOD:
             return 36
+        case Opcode.LOOP:
+            return 37
+        case Opcode.INDEX:
+            return 39
         case _:
             raise UnknownOpcodeError(opcode)
+
+
+# Микропрограмма для тракта с регистрами TOP/NEXT (RegisterDataPath): прямой путь NEXT -> TOP,
+# чтение ячейки под NEXT и обмен TOP <-> NEXT позволяют выполнять DUP, OVER и SWAP за один шаг.
+# Адреса входа совпадают с mc_memory, освободившиеся шаги не используются.
+register_mc_memory = list(mc_memory)
+register_mc_memory[opcode_to_mpc(Opcode.DUP)] = [MUX.MPC_ZERO, Latch.MPC, MUX.SP_INC, Latch.SP, MUX.TOS_NEXT, Latch.TOP]
+register_mc_memory[opcode_to_mpc(Opcode.OVER)] = [
+    MUX.MPC_ZERO,
+    Latch.MPC,
+    MUX.SP_INC,
+    Latch.SP,
+    MUX.TOS_STACK,
+    Latch.TOP,
+]
+register_mc_memory[opcode_to_mpc(Opcode.SWAP)] = [MUX.MPC_ZERO, Latch.MPC, Latch.TOP_NEXT]
+
+
+def microcode_ticks(microcode: list, mpc: int) -> int:
+    """Количество тактов от адреса mpc до возврата в выборку (или останова)"""
+    ticks = 0
+    while not any(isinstance(signal, Halt) for signal in microcode[mpc]):
+        ticks += 1
+        if MUX.MPC_ZERO in microcode[mpc] or MUX.MPC_OPCODE in microcode[mpc]:
+            break
+        mpc += 1
+    return ticks
+
+
+def opcode_ticks(microcode: list = mc_memory) -> dict[Opcode, int]:
+    """Таблица тактов на инструкцию: выборка + исполнение по микропрограмме"""
+    fetch = microcode_ticks(microcode, 0)
+    table = {}
+    for opcode in Opcode:
+        try:
+            table[opcode] = fetch + microcode_ticks(microcode, opcode_to_mpc(opcode))
+        except UnknownOpcodeError:
+            continue
+    return table
+
+
+def decode_program(program: Program) -> array:
+    """Предекодирование: адрес входа в микропрограмму для каждой инструкции программы"""
+    entries = {opcode: opcode_to_mpc(opcode) for opcode in set(program.opcodes)}
+    return array("H", [entries[opcode] for opcode in program.opcodes])
@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+import mmap
+from array import array
+from pathlib import Path
+
+# Размер страницы памяти данных в ячейках
+PAGE_SIZE = 4096
+
+
+class PagedMemory:
+    """Память данных из страниц, которые создаются при первой записи.
+
+    Чтение из нетронутой страницы возвращает 0 и ничего не выделяет, поэтому
+    стоимость запуска не зависит от размера памяти, а расход - от числа затронутых
+    страниц. Страница - список (ячейки хранят любые числа Python) или `array(typecode)`.
+    """
+
+    size: int = None
+    page_size: int = None
+    typecode: str | None = None
+    pages: dict[int, list | array] = None
+
+    def __init__(self, size: int, page_size: int = PAGE_SIZE, typecode: str | None = None):
+        self.size = size
+        self.page_size = page_size
+        self.typecode = typecode
+        self.pages = {}
+
+    def __len__(self):
+        return self.size
+
+    def check(self, address: int):
+        if not 0 <= address < self.size:
+            raise IndexError("Memory address out of range: " + str(address))
+
+    def __getitem__(self, address: int):
+        self.check(address)
+        page = self.pages.get(address // self.page_size)
+        return 0 if page is None else page[address % self.page_size]
+
+    def __setitem__(self, address: int, value):
+        self.check(address)
+        number = address // self.page_size
+        page = self.pages.get(number)
+        if page is None:
+            page = self.pages[number] = self.new_page()
+        page[address % self.page_size] = value
+
+    def new_page(self) -> list | array:
+        if self.typecode is None:
+            return [0] * self.page_size
+        return array(self.typecode, bytes(array(self.typecode).itemsize * self.page_size))
+
+    def close(self):
+        pass
+
+
+class MappedMemory(PagedMemory):
+    """Память данных в файле, отображённом через mmap.
+
+    Файл расширяется до `size` ячеек `typecode` без записи (разреженный файл), страницы
+    выделяет ОС при первом обращении, а содержимое памяти остаётся в файле после останова.
+    """
+
+    _file = None
+    _mmap: mmap.mmap = None
+    _view: memoryview = None
+
+    def __init__(self, size: int, path: str, typecode: str = "q"):
+        super().__init__(size, typecode=typecode)
+        Path(path).touch()
+        self._file = open(path, "r+b")
+        self._file.truncate(size * array(typecode).itemsize)
+        self._mmap = mmap.mmap(self._file.fileno(), 0)
+        self._view = memoryview(self._mmap).cast(typecode)
+
+    def __getitem__(self, address: int):
+        self.check(address)
+        return self._view[address]
+
+    def __setitem__(self, address: int, value):
+        self.check(address)
+        self._view[address] = value
+
+    def close(self):
+        if self._view is not None:
+            self._view.release()
+            self._mmap.close()
+            self._file.close()
+            self._view = None
+
+
+def make_memory(size: int, typecode: str | None = None, path: str | None = None) -> list | array | PagedMemory:
+    """Память данных: до страницы - плоский список или массив, больше - страницы; с `path` - mmap файла"""
+    if path is not None:
+        return MappedMemory(size, path, typecode or "q")
+    if size > PAGE_SIZE:
+        return PagedMemory(size, typecode=typecode)
+    if typecode is None:
+        return [0] * size
+    return array(typecode, bytes(array(typecode).itemsize * size))
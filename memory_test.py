@@ -0,0 +1,80 @@
+import os
+import tempfile
+
+import machine
+import pytest
+import translator
+from engine_test import translate
+from memory import PAGE_SIZE, MappedMemory, PagedMemory
+
+LARGE_MEMORY_SIZE = 2_000_000
+LARGE_PROGRAM = (
+    "variable buffer 1000000 allocate\n"
+    "variable last\n"
+    "last 7 ! buffer 999999 + 5 !\n"
+    "last @ 11 emit buffer 999999 + @ 11 emit\n"
+)
+
+
+def translate_text(text: str, tmpdirname: str, memory_size: int):
+    source = os.path.join(tmpdirname, "source.fth")
+    with open(source, "w", encoding="utf-8") as f:
+        f.write(text)
+    return translate(source, tmpdirname, memory_size)
+
+
+def test_paged_memory_allocates_touched_pages():
+    memory = PagedMemory(LARGE_MEMORY_SIZE)
+
+    assert memory[LARGE_MEMORY_SIZE - 1] == 0
+    assert memory.pages == {}
+    memory[5] = 1
+    memory[PAGE_SIZE + 5] = 2
+    memory[PAGE_SIZE + 6] = 3
+
+    assert (memory[5], memory[PAGE_SIZE + 5], memory[PAGE_SIZE + 6]) == (1, 2, 3)
+    assert sorted(memory.pages) == [0, 1]
+    with pytest.raises(IndexError):
+        memory[LARGE_MEMORY_SIZE] = 1
+    with pytest.raises(IndexError):
+        memory[-1]
+
+
+def test_mapped_memory_keeps_values_in_file():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        path = os.path.join(tmpdirname, "memory.bin")
+        memory = MappedMemory(LARGE_MEMORY_SIZE, path)
+        memory[LARGE_MEMORY_SIZE - 1] = -3
+        memory.close()
+
+        memory = MappedMemory(LARGE_MEMORY_SIZE, path)
+        assert (memory[0], memory[LARGE_MEMORY_SIZE - 1]) == (0, -3)
+        memory.close()
+
+
+def test_translator_checks_memory_size():
+    with tempfile.TemporaryDirectory() as tmpdirname, pytest.raises(AssertionError):
+        translate_text(LARGE_PROGRAM, tmpdirname, translator.MEMORY_SIZE)
+
+
+@pytest.mark.parametrize("datapath_kind", machine.DATAPATHS)
+@pytest.mark.parametrize("engine", machine.ENGINES)
+def test_large_memory(engine, datapath_kind):
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        code, memory = translate_text(LARGE_PROGRAM, tmpdirname, LARGE_MEMORY_SIZE)
+
+    assert (
+        machine.simulation(code, [], memory, engine, datapath_kind=datapath_kind, memory_size=LARGE_MEMORY_SIZE)[0]
+        == "75"
+    )
+
+
+def test_memory_file():
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        code, memory = translate_text(LARGE_PROGRAM, tmpdirname, LARGE_MEMORY_SIZE)
+        path = os.path.join(tmpdirname, "memory.bin")
+        machine.simulation(code, [], memory, "fast", memory_size=LARGE_MEMORY_SIZE, memory_file=path)
+
+        mapped = MappedMemory(LARGE_MEMORY_SIZE, path)
+        assert (mapped[0], mapped[999999], mapped[1000002]) == (1000000, 5, 7)
+        mapped.close()
@@ -0,0 +1,358 @@
+from __future__ import annotations
+
+from collections import Counter
+from functools import partial
+from itertools import pairwise
+
+from isa import Arg, ArgType, Instruction, Opcode
+
+FOLDABLE = {
+    Opcode.ADD: lambda left, right: left + right,
+    Opcode.SUB: lambda left, right: left - right,
+    Opcode.MUL: lambda left, right: left * right,
+    Opcode.MOD: lambda left, right: left % right if right != 0 else None,
+    Opcode.EQ: lambda left, right: -1 if left == right else 0,
+    Opcode.GR: lambda left, right: -1 if left > right else 0,
+    Opcode.LS: lambda left, right: -1 if left < right else 0,
+}
+"Операции АЛУ, вычисляемые при трансляции (DIV в модели даёт дробь и не сворачивается)"
+
+IDENTITIES = [(Opcode.ADD, 0), (Opcode.SUB, 0), (Opcode.MUL, 1)]
+"Операция и константа, не меняющие значение на стеке"
+
+REDUNDANT_SHUFFLES = [
+    (Opcode.DUP, Opcode.DROP),
+    (Opcode.OVER, Opcode.DROP),
+    (Opcode.SWAP, Opcode.SWAP),
+    (Opcode.PUSH, Opcode.DROP),
+]
+
+CANCELLING_TRANSFERS = [(Opcode.POP, Opcode.RPOP), (Opcode.RPOP, Opcode.POP)]
+
+LOOP_SEQUENCE = (
+    Opcode.RPOP,
+    Opcode.RPOP,
+    Opcode.PUSH,
+    Opcode.ADD,
+    Opcode.OVER,
+    Opcode.OVER,
+    Opcode.GR,
+    Opcode.ZJMP,
+    Opcode.DROP,
+    Opcode.DROP,
+)
+"Трансляция `loop`: ZJMP ведёт на пару POP слова `do`"
+
+INDEX_SEQUENCE = (Opcode.RPOP, Opcode.RPOP, Opcode.OVER, Opcode.OVER, Opcode.POP, Opcode.POP, Opcode.SWAP, Opcode.DROP)
+"Трансляция `i`"
+
+INLINE_THRESHOLD = 12
+"Наибольшая длина тела слова (без RET), которое подставляется в каждую точку вызова"
+
+
+def push(value: int) -> Instruction:
+    return Instruction(Opcode.PUSH, [Arg(ArgType.CONST, value)])
+
+
+def push_value(instruction: Instruction) -> int | None:
+    if instruction.opcode is not Opcode.PUSH:
+        return None
+    return int(instruction.arg[0].value)
+
+
+def opcodes(window: list[Instruction]) -> tuple[Opcode, ...]:
+    return tuple(instruction.opcode for instruction in window)
+
+
+# Шаблоны проходов: по окну инструкций возвращают (сколько инструкций заменить, замена) или None
+
+
+def stack_shuffles(window: list[Instruction]) -> tuple[int, list[Instruction]] | None:
+    """Избыточные перестановки на стеке данных"""
+    if opcodes(window[:2]) in REDUNDANT_SHUFFLES:
+        return 2, []
+    if opcodes(window[:2]) == (Opcode.DUP, Opcode.SWAP):
+        return 2, [window[0]]
+    if opcodes(window[:3]) == (Opcode.PUSH, Opcode.PUSH, Opcode.SWAP):
+        return 3, [window[1], window[0]]
+    return None
+
+
+def constant_folding(window: list[Instruction]) -> tuple[int, list[Instruction]] | None:
+    """Свёртка арифметики над константами"""
+    if len(window) < 2 or push_value(window[0]) is None:
+        return None
+    if (window[1].opcode, push_value(window[0])) in IDENTITIES:
+        return 2, []
+    if len(window) < 3 or push_value(window[1]) is None or window[2].opcode not in FOLDABLE:
+        return None
+    result = FOLDABLE[window[2].opcode](push_value(window[0]), push_value(window[1]))
+    return None if result is None else (3, [push(result)])
+
+
+def tail_calls(window: list[Instruction]) -> tuple[int, list[Instruction]] | None:
+    """CALL перед RET (в том числе через JMP на RET после `else`) заменяется переходом.
+
+    RET остаётся на месте и возвращает управление в исходную точку вызова.
+    """
+    if len(window) < 2 or window[0].opcode is not Opcode.CALL:
+        return None
+    following = window[1]
+    if following.opcode is Opcode.JMP and following.arg[0].argtype is ArgType.LABEL:
+        following = following.arg[0].value
+    if following.opcode is not Opcode.RET:
+        return None
+    return 1, [Instruction(Opcode.JMP, window[0].arg)]
+
+
+def loop_superinstructions(
+    successors: dict[int, Instruction], window: list[Instruction]
+) -> tuple[int, list[Instruction]] | None:
+    """`i` -> INDEX, `loop` -> LOOP с переходом сразу на тело цикла (после POP POP слова `do`)"""
+    if opcodes(window[: len(INDEX_SEQUENCE)]) == INDEX_SEQUENCE:
+        return len(INDEX_SEQUENCE), [Instruction(Opcode.INDEX, [])]
+    if opcodes(window) != LOOP_SEQUENCE or push_value(window[2]) != 1 or window[7].arg[0].argtype is not ArgType.LABEL:
+        return None
+    do = window[7].arg[0].value
+    if do.opcode is not Opcode.POP or successors[id(do)].opcode is not Opcode.POP:
+        return None
+    body = successors[id(successors[id(do)])]
+    return len(LOOP_SEQUENCE), [Instruction(Opcode.LOOP, [Arg(ArgType.LABEL, body)])]
+
+
+def fuse_loops(code: list[Instruction]) -> tuple[list[Instruction], int]:
+    """Заменить трансляцию `loop` и `i` суперинструкциями LOOP и INDEX"""
+    successors = {id(instruction): following for instruction, following in pairwise(code)}
+    return rewrite(code, partial(loop_superinstructions, successors), len(LOOP_SEQUENCE))
+
+
+def return_stack_pairs(window: list[Instruction]) -> tuple[int, list[Instruction]] | None:
+    """Взаимно уничтожающиеся пересылки POP/RPOP через стек возврата"""
+    if opcodes(window[:2]) in CANCELLING_TRANSFERS:
+        return 2, []
+    return None
+
+
+def link(term_instructions: list[list[Instruction]]) -> list[Instruction]:
+    """Склеить инструкции термов в плоский список, заменив номера термов ссылками на инструкции"""
+    code = [instruction for term_instruction in term_instructions for instruction in term_instruction]
+    term_starts = [0]
+    for term_instruction in term_instructions:
+        term_starts.append(term_starts[-1] + len(term_instruction))
+    for instruction in code:
+        for param in instruction.arg:
+            if param.argtype is ArgType.ADD:
+                param.argtype = ArgType.LABEL
+                param.value = code[term_starts[param.value]]
+    return code
+
+
+def jump_targets(code: list[Instruction]) -> set[int]:
+    return {id(param.value) for instruction in code for param in instruction.arg if param.argtype is ArgType.LABEL}
+
+
+def resolve(target: Instruction, redirect: dict[int, Instruction]) -> Instruction:
+    """Пройти по цепочке переносов ссылки (инструкция могла быть заменена несколько раз)"""
+    seen = set()
+    while id(target) in redirect and id(target) not in seen:
+        seen.add(id(target))
+        target = redirect[id(target)]
+    return target
+
+
+def relabel(code: list[Instruction], redirect: dict[int, Instruction]):
+    for instruction in code:
+        for param in instruction.arg:
+            if param.argtype is ArgType.LABEL:
+                param.value = resolve(param.value, redirect)
+
+
+def rewrite(code: list[Instruction], rule, window_size: int) -> tuple[list[Instruction], int]:
+    """Один проход окна по коду. Возвращает новый код и число применённых замен.
+
+    Шаблон может заглядывать за цель перехода, но заменяет её только первой инструкцией окна;
+    ссылки на заменённую инструкцию переносятся на первую инструкцию замены или на следующую за ней.
+    """
+    targets = jump_targets(code)
+    result = []
+    redirect = {}
+    pending = []
+    matches = 0
+    index = 0
+    while index < len(code):
+        window = code[index : index + window_size]
+        match = rule(window)
+        for position in range(1, len(window)):
+            if id(window[position]) in targets:
+                if match is not None and match[0] > position:
+                    match = rule(window[:position])
+                break
+        matches += match is not None
+        consumed, replacement = match if match is not None else (1, [code[index]])
+        pending.append(code[index])
+        if replacement:
+            redirect.update({id(instruction): replacement[0] for instruction in pending})
+            pending = []
+        result.extend(replacement)
+        index += consumed
+    relabel(result, redirect)
+    return result, matches
+
+
+def clone(instruction: Instruction) -> Instruction:
+    return Instruction(instruction.opcode, [Arg(param.argtype, param.value) for param in instruction.arg])
+
+
+def words(code: list[Instruction]) -> dict[int, tuple[int, int]]:
+    """Определения слов: индекс точки входа -> (индекс JMP в обход тела, индекс RET).
+
+    `:` транслируется в JMP на инструкцию после `;`, так что точка входа - цель CALL,
+    перед которой стоит JMP на инструкцию, следующую за RET.
+    """
+    positions = {id(instruction): index for index, instruction in enumerate(code)}
+    result = {}
+    for instruction in code:
+        if instruction.opcode is not Opcode.CALL:
+            continue
+        entry = positions[id(instruction.arg[0].value)]
+        if entry == 0 or code[entry - 1].opcode is not Opcode.JMP:
+            continue
+        end = positions[id(code[entry - 1].arg[0].value)]
+        if end > entry and code[end - 1].opcode is Opcode.RET:
+            result[entry] = (entry - 1, end - 1)
+    return result
+
+
+def inlinable(code: list[Instruction], entry: int, ret: int) -> bool:
+    """Переходы тела не выходят за его пределы (CALL других слов допустимы), нет рекурсии"""
+    body = {id(instruction) for instruction in code[entry : ret + 1]}
+    for instruction in code[entry:ret]:
+        for param in instruction.arg:
+            if param.argtype is not ArgType.LABEL:
+                continue
+            if param.value is code[entry] or (instruction.opcode is not Opcode.CALL and id(param.value) not in body):
+                return False
+    return True
+
+
+def expand_call(code: list[Instruction], call: int, entry: int, ret: int) -> list[Instruction]:
+    """Копия тела слова для точки вызова `call`.
+
+    Ссылки внутри тела переносятся на копии, переходы на RET - на инструкцию после CALL;
+    сами эти инструкции не изменяются.
+    """
+    copies = {id(original): clone(original) for original in code[entry:ret]}
+    exits = {id(code[ret]): code[call + 1]}
+    for copy in copies.values():
+        for param in copy.arg:
+            if param.argtype is ArgType.LABEL:
+                param.value = copies.get(id(param.value)) or exits.get(id(param.value), param.value)
+    return list(copies.values())
+
+
+def inline_words(code: list[Instruction]) -> tuple[list[Instruction], int]:
+    """Подставить тела коротких или вызываемых один раз нерекурсивных слов вместо CALL"""
+    calls = Counter(id(instruction.arg[0].value) for instruction in code if instruction.opcode is Opcode.CALL)
+    bodies = {
+        id(code[entry]): (entry, ret)
+        for entry, (_, ret) in words(code).items()
+        if (ret - entry <= INLINE_THRESHOLD or calls[id(code[entry])] == 1) and inlinable(code, entry, ret)
+    }
+
+    result = []
+    redirect = {}
+    pending = []
+    matches = 0
+    for index, instruction in enumerate(code):
+        pending.append(instruction)
+        replacement = [instruction]
+        if instruction.opcode is Opcode.CALL and id(instruction.arg[0].value) in bodies:
+            replacement = expand_call(code, index, *bodies[id(instruction.arg[0].value)])
+            matches += 1
+        if replacement:
+            redirect.update({id(original): replacement[0] for original in pending})
+            pending = []
+        result.extend(replacement)
+    relabel(result, redirect)
+    return result, matches
+
+
+def definition_end(code: list[Instruction], positions: dict[int, int], index: int) -> int | None:
+    """Индекс инструкции после RET, если `code[index]` - JMP в обход определения слова"""
+    if code[index].opcode is not Opcode.JMP:
+        return None
+    end = positions[id(code[index].arg[0].value)]
+    body = code[index + 1 : end]
+    if not body or body[-1].opcode is not Opcode.RET:
+        return None
+    if any(instruction.opcode is Opcode.RET for instruction in body[:-1]):
+        return None
+    return end
+
+
+def dead_words(code: list[Instruction]) -> tuple[list[Instruction], int]:
+    """Удалить определения слов, на которые не осталось ссылок извне тела"""
+    positions = {id(instruction): index for index, instruction in enumerate(code)}
+    removed = set()
+    redirect = {}
+    for index, instruction in enumerate(code):
+        end = definition_end(code, positions, index)
+        if end is None:
+            continue
+        body = {id(body_instruction) for body_instruction in code[index + 1 : end]}
+        referenced = any(
+            param.argtype is ArgType.LABEL and id(param.value) in body
+            for outside in code[: index + 1] + code[end:]
+            for param in outside.arg
+        )
+        if not referenced:
+            removed.update(range(index, end))
+            redirect[id(instruction)] = code[end]
+    result = [instruction for index, instruction in enumerate(code) if index not in removed]
+    relabel(result, redirect)
+    return result, len(redirect)
+
+
+def optimize(code: list[Instruction], level: int) -> tuple[list[Instruction], dict[str, tuple[int, int]]]:
+    """Применять проходы уровня до неподвижной точки.
+
+    Возвращает код и для каждого прохода число замен и удалённых инструкций
+    (отрицательное, если проход увеличил код).
+    """
+    report = dict.fromkeys(OPTIMIZATION_LEVELS[level], (0, 0))
+    changed = True
+    while changed:
+        changed = False
+        for name in OPTIMIZATION_LEVELS[level]:
+            optimized, matches = PASSES[name](code)
+            rewrites, removed = report[name]
+            report[name] = (rewrites + matches, removed + len(code) - len(optimized))
+            changed = changed or matches > 0
+            code = optimized
+    return code, report
+
+
+PASSES = {
+    "stack_shuffles": partial(rewrite, rule=stack_shuffles, window_size=3),
+    "constant_folding": partial(rewrite, rule=constant_folding, window_size=3),
+    "return_stack_pairs": partial(rewrite, rule=return_stack_pairs, window_size=2),
+    "tail_calls": partial(rewrite, rule=tail_calls, window_size=2),
+    "fuse_loops": fuse_loops,
+    "inline_words": inline_words,
+    "dead_words": dead_words,
+}
+"Проход оптимизатора: по коду возвращает новый код и число замен"
+
+OPTIMIZATION_LEVELS = {
+    0: [],
+    1: ["fuse_loops", "stack_shuffles", "constant_folding", "return_stack_pairs", "tail_calls"],
+    2: [
+        "inline_words",
+        "dead_words",
+        "fuse_loops",
+        "stack_shuffles",
+        "constant_folding",
+        "return_stack_pairs",
+        "tail_calls",
+    ],
+}
@@ -0,0 +1,93 @@
+import contextlib
+import io
+import os
+import tempfile
+
+import machine
+import pytest
+import translator
+from engine_test import PROGRAMS, input_tokens
+from isa import Opcode, read_code
+from optimizer import OPTIMIZATION_LEVELS
+
+
+def translate(source: str, optimization: int):
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        target = os.path.join(tmpdirname, "target.bin")
+        with contextlib.redirect_stdout(io.StringIO()):
+            translator.main(source, target, optimization=optimization)
+        return read_code(target)
+
+
+@pytest.mark.parametrize("optimization", [level for level in OPTIMIZATION_LEVELS if level != 0])
+@pytest.mark.parametrize(("source", "input_file"), PROGRAMS)
+def test_optimization_keeps_output(optimization, source, input_file):
+    code, memory = translate(source, 0)
+    expected_output, expected_instructions, expected_ticks = machine.simulation(code, input_tokens(input_file), memory)
+
+    code, memory = translate(source, optimization)
+    output, instructions, ticks = machine.simulation(code, input_tokens(input_file), memory)
+
+    assert output == expected_output
+    assert instructions <= expected_instructions
+    assert ticks <= expected_ticks
+
+
+def translate_source(text: str, optimization: int):
+    with tempfile.TemporaryDirectory() as tmpdirname:
+        source = os.path.join(tmpdirname, "source.fth")
+        with open(source, "w", encoding="utf-8") as f:
+            f.write(text)
+        return translate(source, optimization)
+
+
+def test_tail_call_keeps_return_stack_constant(monkeypatch):
+    monkeypatch.setattr(machine, "TICK_LIMIT", 100000)
+    code, memory = translate_source(": countdown dup 0 = if 1 - countdown then ;\n2000 countdown 11 emit\n", 1)
+
+    output, _, ticks = machine.simulation(code, [], memory)
+
+    assert output == "0"
+    assert ticks < machine.TICK_LIMIT
+
+
+@pytest.mark.parametrize(
+    ("source", "expected_output"),
+    [
+        (": a 1 + ; : b a a ; 5 b 11 emit", "7"),
+        (": a 1 + ; 5 a a a 11 emit", "8"),
+        (": sign dup 0 = if drop 1 else drop 2 then ; 0 sign 11 emit 3 sign 11 emit", "21"),
+        (
+            "variable v0\n: w0 dup if dup 11 emit dup 11 emit 1 then - 1 drop 9 ;\n"
+            "5 5 5 5 dup 11 emit dup v0 0 ! w0 w0 11 emit",
+            "59",
+        ),
+    ],
+)
+def test_inlining(source, expected_output):
+    code, memory = translate_source(source, 0)
+    _, expected_instructions, expected_ticks = machine.simulation(code, [], memory)
+
+    code, memory = translate_source(source, 2)
+    output, instructions, ticks = machine.simulation(code, [], memory)
+
+    assert output == expected_output
+    assert Opcode.CALL not in code.opcodes
+    assert Opcode.RET not in code.opcodes
+    assert instructions < expected_instructions
+    assert ticks < expected_ticks
+
+
+@pytest.mark.parametrize("engine", machine.ENGINES)
+def test_loop_superinstructions(engine):
+    source = "3 0 do 2 0 do i 11 emit loop 32 11 emit loop"
+    code, memory = translate_source(source, 0)
+    expected_output, _, expected_ticks = machine.simulation(code, [], memory)
+
+    code, memory = translate_source(source, 1)
+    output, _, ticks = machine.simulation(code, [], memory, engine)
+
+    assert output == expected_output == "01 01 01 "
+    assert Opcode.LOOP in code.opcodes
+    assert Opcode.INDEX in code.opcodes
+    assert ticks < expected_ticks / 3
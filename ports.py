@@ -0,0 +1,65 @@
+from __future__ import annotations
+
+from collections import deque
+
+INPUT_PORT = 10
+OUTPUT_PORT = 11
+
+READ_CHUNK = 1 << 16
+
+
+def render_value(value: int) -> str:
+    """Представление значения порта вывода: ASCII символ или число"""
+    return chr(value) if value > 9 and value <= 255 else str(value)
+
+
+class InputPort:
+    """Порт ввода: символы выдаются по одному из очереди или по частям из файла.
+
+    По окончании данных порт возвращает `chr(0)`.
+    """
+
+    _buffer: deque[str] | None = None
+    _file = None
+    _chunk: str = None
+    _position: int = None
+
+    def __init__(self, source=None):
+        self._chunk = ""
+        self._position = 0
+        if hasattr(source, "read"):
+            self._file = source
+        else:
+            self._buffer = deque(source if source is not None else [])
+
+    def read(self) -> str:
+        if self._buffer is not None:
+            return self._buffer.popleft() if self._buffer else chr(0)
+        if self._position == len(self._chunk):
+            self._chunk = self._file.read(READ_CHUNK)
+            self._position = 0
+            if not self._chunk:
+                return chr(0)
+        value = self._chunk[self._position]
+        self._position += 1
+        return value
+
+
+class OutputPort:
+    """Порт вывода: значения дописываются в буфер и/или сразу в поток (stdout, файл)"""
+
+    values: list[int] | None = None
+    stream = None
+
+    def __init__(self, stream=None, keep: bool = True):
+        self.values = [] if keep else None
+        self.stream = stream
+
+    def write(self, value: int):
+        if self.values is not None:
+            self.values.append(value)
+        if self.stream is not None:
+            self.stream.write(render_value(value))
+
+    def text(self) -> str:
+        return "".join(map(render_value, self.values or []))
@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import logging
+import struct
+
+from isa import Opcode
+from ports import render_value
+
+TRACE_SINKS = ["auto", "text", "binary", "none"]
+
+OPCODES = list(Opcode)
+OPCODE_NUMBERS = {opcode: number for number, opcode in enumerate(OPCODES)}
+NO_OPCODE = 0xFF
+
+# Тег, TICK, PC, MPC, номер опкода в IR, SP, RSP, TOP, NEXT, RS
+TICK_RECORD = struct.Struct("<cIiHBiiqqq")
+
+# Тег, порт, значение
+IO_RECORD = struct.Struct("<ciq")
+
+
+class TraceSink:
+    """Приёмник трассировки модели. Состояние снимается только при подключённом приёмнике"""
+
+    def tick(self, control_unit):
+        pass
+
+    def input(self, port: int, value: str):
+        pass
+
+    def output(self, port: int, value: int):
+        pass
+
+    def close(self):
+        pass
+
+
+class TextTraceSink(TraceSink):
+    """Журнал в формате golden-тестов через `logging` (уровень DEBUG)"""
+
+    _output: dict[int, str] = None
+
+    def __init__(self):
+        self._output = {}
+
+    def tick(self, control_unit):
+        logging.debug(repr(control_unit), stacklevel=2)
+
+    def input(self, port: int, value: str):
+        logging.debug(f"INPUT: '{value}'", stacklevel=2)
+
+    def output(self, port: int, value: int):
+        rendered = self._output.get(port, "")
+        logging.debug(f"OUTPUT: {rendered} << '{value}'", stacklevel=2)
+        self._output[port] = rendered + render_value(value)
+
+
+class BinaryTraceSink(TraceSink):
+    """Компактная двоичная трассировка: запись фиксированного размера на каждый такт и событие ввода/вывода"""
+
+    file = None
+
+    def __init__(self, filename: str):
+        self.file = open(filename, "wb")
+
+    def tick(self, control_unit):
+        pc, opcode, tick, mpc, top, next_, rs, sp, rsp = control_unit.state()
+        self.file.write(
+            TICK_RECORD.pack(
+                b"T",
+                tick,
+                pc,
+                mpc,
+                NO_OPCODE if opcode is None else OPCODE_NUMBERS[opcode],
+                sp,
+                rsp,
+                int(top),
+                int(next_),
+                int(rs),
+            )
+        )
+
+    def input(self, port: int, value: str):
+        self.file.write(IO_RECORD.pack(b"I", port, ord(value) if value else 0))
+
+    def output(self, port: int, value: int):
+        self.file.write(IO_RECORD.pack(b"O", port, int(value)))
+
+    def close(self):
+        self.file.close()
+
+
+def read_binary_trace(filename: str):
+    """Построчно читает двоичную трассировку: ("tick", {...}) или ("input"/"output", порт, значение)"""
+    with open(filename, "rb") as file:
+        data = file.read()
+    offset = 0
+    while offset < len(data):
+        tag = data[offset : offset + 1]
+        if tag == b"T":
+            _, tick, pc, mpc, opcode, sp, rsp, top, next_, rs = TICK_RECORD.unpack_from(data, offset)
+            offset += TICK_RECORD.size
+            yield (
+                "tick",
+                {
+                    "tick": tick,
+                    "pc": pc,
+                    "mpc": mpc,
+                    "opcode": None if opcode == NO_OPCODE else OPCODES[opcode],
+                    "sp": sp,
+                    "rsp": rsp,
+                    "top": top,
+                    "next": next_,
+                    "rs": rs,
+                },
+            )
+        else:
+            _, port, value = IO_RECORD.unpack_from(data, offset)
+            offset += IO_RECORD.size
+            yield ("input" if tag == b"I" else "output", port, value)
+
+
+def make_trace_sink(kind: str = "auto", filename: str | None = None) -> TraceSink | None:
+    """Создаёт приёмник по имени. `auto` - текстовый журнал, если включён уровень DEBUG"""
+    if kind == "auto":
+        kind = "text" if logging.getLogger().isEnabledFor(logging.DEBUG) else "none"
+    if kind == "text":
+        return TextTraceSink()
+    if kind == "binary":
+        assert filename is not None, "Binary trace requires a trace file"
+        return BinaryTraceSink(filename)
+    if kind == "none":
+        return None
+    raise ValueError("Unknown trace sink: " + kind)
@@ -1,15 +1,18 @@
 from __future__ import annotations
 
+import argparse
 import re
-import sys
 
 from exceptions import BadAllocationSizeError, TokenTranslationError
-from isa import Arg, ArgType, Instruction, Opcode, Term, write_code
+from isa import MEMORY_SIZE, Arg, ArgType, Instruction, Opcode, Term, write_binary_code, write_code
+from optimizer import OPTIMIZATION_LEVELS, link, optimize
 
 variables = {}
 variable_current_address = 0
+memory_size = MEMORY_SIZE
 functions = {}
 memory = {}
+optimization_report = {}
 
 
 def clear_line(line) -> str:
@@ -152,6 +155,7 @@ def set_variables(terms: list[Term]) -> None:
         if term.name == "variable":
             assert is_word(terms[term_index + 1].name), f"Unaccaptable variabel defenition at {term.number}"
             assert terms[term_index + 1].name not in variables, f"Variable already defined at {term.number}"
+            assert variable_current_address < memory_size, f"Out of data memory at {term.number}"
             variables[terms[term_index + 1].name] = variable_current_address
             variable_current_address += 1
             terms[term_index + 1].converted = True
@@ -166,10 +170,12 @@ def set_allocate(terms: list[Term], term_num: int) -> None:
     memory[variable_current_address - 1] = int(terms[term_num - 1].name)
     try:
         allocate_size = int(terms[term_num - 1].name) + 1
-        assert 1 <= allocate_size <= 100, "Incorrect allocate size at " + str(term.word_number - 1)
+        assert 1 <= allocate_size <= memory_size - variable_current_address, "Incorrect allocate size at " + str(
+            term.number - 1
+        )
         variable_current_address += allocate_size
     except ValueError:
-        raise BadAllocationSizeError(term.word_number - 1) from None
+        raise BadAllocationSizeError(term.number - 1) from None
 
 
 def set_conditional(terms: list[Term]) -> None:
@@ -205,20 +211,27 @@ def code_correctness_check(terms: list[Term]):
 
 
 def fix_addresses(term_instructions: list[list[Instruction]]) -> list[Instruction]:
-    final_instructions = []
+    final_instructions = [
+        instruction
+        for term_instruction in term_instructions
+        if term_instruction is not None
+        for instruction in term_instruction
+    ]
     term_lens = [0]
 
     for instr_num, instruction in enumerate(term_instructions):
         term_lens.append(term_lens[instr_num] + len(instruction))
 
-    for term_instruction in term_instructions:
-        if term_instruction is not None:
-            for instruction in term_instruction:
-                for param_num, param in enumerate(instruction.arg):
-                    if param.argtype is ArgType.ADD:
-                        instruction.arg[param_num].value = term_lens[param.value] - 1
-                        instruction.arg[param_num].argtype = ArgType.CONST
-                final_instructions.append(instruction)
+    positions = {id(instruction): index for index, instruction in enumerate(final_instructions)}
+    for instruction in final_instructions:
+        for param in instruction.arg:
+            if param.argtype is ArgType.ADD:
+                param.value = term_lens[param.value] - 1
+            elif param.argtype is ArgType.LABEL:
+                param.value = positions[id(param.value)] - 1
+            else:
+                continue
+            param.argtype = ArgType.CONST
 
     return final_instructions
 
@@ -295,19 +308,24 @@ def term_to_instruction(term: Term) -> list(Instruction):
     return instructions
 
 
-def terms_to_instructions(terms: list[Term]) -> list[Instruction]:
+def terms_to_instructions(terms: list[Term], optimization: int = 0) -> list[Instruction]:
     instructions = list(map(term_to_instruction, terms))
+    if optimization:
+        code = link([*instructions, [Instruction(Opcode.HALT, [])]])
+        code, report = optimize(code, optimization)
+        optimization_report.update(report)
+        return fix_addresses([code])
     instructions = fix_addresses(instructions)
     return [*instructions, Instruction(Opcode.HALT, [])]
 
 
-def translate(lines):
+def translate(lines, optimization: int = 0):
     terms = split_to_terms(lines)
     code_correctness_check(terms)
 
     instructions: list[Instruction] = []
 
-    instructions = terms_to_instructions(terms)
+    instructions = terms_to_instructions(terms, optimization)
 
     commands = []
     for index, instruction in enumerate(instructions):
@@ -322,20 +340,52 @@ def translate(lines):
     return commands
 
 
-def main(source, target):
-    global variable_current_address, variables, memory, functions
+def main(source, target, code_format="json", optimization=0, data_memory_size=MEMORY_SIZE):
+    global variable_current_address, variables, memory, functions, optimization_report, memory_size
     variables = {}
     variable_current_address = 0
+    memory_size = data_memory_size
     functions = {}
     memory = {}
+    optimization_report = {}
     with open(source, encoding="utf-8") as f:
         source = f.read().splitlines()
-    code = translate(source)
-
-    write_code(target, code, memory)
+    code = translate(source, optimization)
+
+    if code_format == "binary":
+        write_binary_code(target, code, memory)
+    else:
+        write_code(target, code, memory)
+    for pass_name, (rewrites, removed) in optimization_report.items():
+        print(f"optimization {pass_name}: {rewrites} rewrites, code size {-removed:+d} instr")
     print("source LoC:", len(source), "code instr:", len(code))
 
 
 if __name__ == "__main__":
-    assert len(sys.argv) == 3, "Invalid usage: python3 translator.py <source> <target>"
-    main(sys.argv[1], sys.argv[2])
+    parser = argparse.ArgumentParser(
+        usage="python3 translator.py <source> <target> [--format json|binary] [-O <level>] [--memory-size <cells>]"
+    )
+    parser.add_argument("source")
+    parser.add_argument("target")
+    parser.add_argument(
+        "--format",
+        choices=["json", "binary"],
+        default="json",
+        help="json - readable debug/export format (default), binary - compact format loaded through mmap",
+    )
+    parser.add_argument(
+        "-O",
+        dest="optimization",
+        type=int,
+        choices=list(OPTIMIZATION_LEVELS),
+        default=0,
+        help="optimization level (0 - translate term by term, default)",
+    )
+    parser.add_argument(
+        "--memory-size",
+        type=int,
+        default=MEMORY_SIZE,
+        help=f"data memory size in cells that variables and allocations must fit in (default {MEMORY_SIZE})",
+    )
+    args = parser.parse_args()
+    main(args.source, args.target, args.format, args.optimization, args.memory_size)